@@ -0,0 +1,93 @@
+"""
+Benchmark for the numerical stage of compare_functions.
+
+Compares the former point-by-point sampling loop (sympy subs with exact
+arithmetic) with the vectorized numpy evaluation, on a set of typical
+calculus answers. Run from the repository root:
+
+    python benchmarks/bench_compare.py
+"""
+import os
+import sys
+import time
+
+import sympy as sp
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from cyllene.MathFunctions.math_compare import compare_numerically  # noqa: E402
+from cyllene.MathFunctions.math_define import define_expression  # noqa: E402
+
+
+# pairs of (student answer, reference answer)
+ANSWERS = [
+    ("2x+3", "3+2x"),
+    ("(x+1)^2", "x^2+2x+1"),
+    ("3x^2-4x+1", "(3x-1)(x-1)"),
+    ("2sin(x)cos(x)", "sin(2x)"),
+    ("exp(2x)*2", "2exp(2x)"),
+    ("1/(2sqrt(x))", "x^(-1/2)/2"),
+    ("x/(x^2+1)", "x/(1+x^2)"),
+    ("log(x^2)", "2log(abs(x))"),
+    ("-sin(x)", "cos(x+pi/2)"),
+    ("3x^2", "3x^2+1"),
+]
+
+
+def legacy_compare_numerically(func_1, func_2, var_1, var_2):
+    """ the sampling loop formerly used in compare_functions """
+
+    d1 = sp.calculus.util.continuous_domain(func_1, var_1, sp.S.Reals)
+    d2 = sp.calculus.util.continuous_domain(func_2, var_2, sp.S.Reals)
+    if d1 != d2:
+        return False
+    inf = d1.inf
+    sup = d1.sup
+    if inf == -sp.oo:
+        inf = -100
+    if sup == sp.oo:
+        sup = 100
+    sample = []
+    h = (sup - inf) / 2000
+    for i in range(2000):
+        p = inf + (i * h)
+        if d1.contains(p):
+            sample.append(p)
+            if func_1.subs(var_1, p) != func_2.subs(var_2, p):
+                return False
+    if len(sample) > 500:
+        return True
+    return "undecided"
+
+
+def time_call(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    print("{:<16} {:<16} {:>12} {:>12} {:>10}".format(
+        "answer", "reference", "before (s)", "after (s)", "verdict"))
+
+    total_before = total_after = 0
+    for answer, reference in ANSWERS:
+        f = define_expression(answer)[0]
+        g = define_expression(reference)[0]
+        var_f = list(f.free_symbols)[0]
+        var_g = list(g.free_symbols)[0]
+
+        _, before = time_call(legacy_compare_numerically, f, g, var_f, var_g)
+        verdict, after = time_call(compare_numerically, f, g, var_f, var_g)
+        total_before += before
+        total_after += after
+
+        print("{:<16} {:<16} {:>12.4f} {:>12.4f} {:>10}".format(
+            answer, reference, before, after, str(verdict)))
+
+    print("{:<33} {:>12.4f} {:>12.4f}".format(
+        "total", total_before, total_after))
+
+
+if __name__ == "__main__":
+    main()
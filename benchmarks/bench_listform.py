@@ -0,0 +1,154 @@
+"""
+Benchmark for string_to_list.
+
+Compares the former recursive implementation (which rescans every
+operand for top-level operators) with the current one (operator index
+and explicit stack), on long polynomials and deeply nested
+compositions, and checks that both give the same list form. Run from
+the repository root:
+
+    python benchmarks/bench_listform.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from cyllene.MathFunctions.math_listform import (  # noqa: E402
+    get_context, get_parentheses_level, string_to_list, unary_operators)
+
+
+def legacy_string_to_list(string):
+    """ the recursive implementation formerly used for string_to_list """
+
+    if string[0] == '-':
+        neg = True
+    else:
+        neg = False
+
+    nest_level = 0
+    plus = []
+    minus = []
+    times = []
+    divide = []
+    power = []
+    for i in range(len(string)):
+        if string[i] == '(':
+            nest_level += 1
+        if string[i] == ')':
+            nest_level -= 1
+        if string[i] == '+' and nest_level == 0:
+            plus += [i]
+        if string[i] == '-' and nest_level == 0 and \
+                (i == 0 or (i > 0 and string[i - 1] not in ['*', '/', '^'])):
+            minus += [i]
+        if string[i] == '*' and nest_level == 0:
+            times += [i]
+        if string[i] == '/' and nest_level == 0:
+            divide += [i]
+        if string[i] == '^' and nest_level == 0:
+            power += [i]
+
+    if len(plus) > 0:
+        pos = plus[0]
+    elif len(minus) > 0 and not neg:
+        pos = minus[-1]
+    elif len(minus) > 1 and neg:
+        pos = minus[-1]
+    elif len(times) > 0:
+        pos = times[0]
+    elif len(divide) > 0:
+        pos = divide[0]
+    elif len(power) > 0:
+        pos = power[0]
+    else:
+        pos = -1
+    if pos > -1:
+        return [string[pos],
+                legacy_string_to_list(string[:pos]),
+                legacy_string_to_list(string[pos + 1:])]
+
+    if string[0] == '(' and string[-1] == ')':
+        return legacy_string_to_list(string[1:-1])
+
+    if neg:
+        return ['neg', legacy_string_to_list(string[1:])]
+
+    for func in unary_operators:
+        if string.startswith(func):
+            if func == 'log':
+                comma_index = [i for i in range(len(string))
+                               if (string[i] == ',' and get_parentheses_level(string, i) == 1)]
+                if len(comma_index) > 0:
+                    i = comma_index[0]
+                    return ['log', get_context(string, i - 1), get_context(string, i + 1)]
+            return [func, legacy_string_to_list(string[len(func):])]
+
+    return string
+
+
+def polynomial(degree):
+    # e.g. 3*x^2-2*x^1+1*x^0
+    return "".join(
+        ("+" if k % 3 else "-") + str(k + 1) + "*x^" + str(k)
+        for k in range(degree, -1, -1))[1:]
+
+
+def composition(depth):
+    # e.g. sin(exp(log(sin(x))))
+    functions = ["sin", "exp", "log", "sqrt", "cos"]
+    string = "x"
+    for k in range(depth):
+        string = functions[k % len(functions)] + "(" + string + "+" + str(k) + ")"
+    return string
+
+
+def parentheses(depth):
+    # e.g. ((((x+1)*2-1)*2+1)*2)
+    string = "x"
+    for k in range(depth):
+        string = "(" + string + ("+" if k % 2 else "-") + "1)*2"
+    return string
+
+
+CASES = [
+    ("polynomial, degree 50", polynomial(50)),
+    ("polynomial, degree 200", polynomial(200)),
+    ("polynomial, degree 800", polynomial(800)),
+    ("composition, depth 20", composition(20)),
+    ("composition, depth 100", composition(100)),
+    ("composition, depth 400", composition(400)),
+    ("parentheses, depth 100", parentheses(100)),
+    ("parentheses, depth 2000", parentheses(2000)),
+]
+
+
+def timed(func, string, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(string)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def main():
+    print("{:<26} {:>7} {:>12} {:>12}  same".format(
+        "case", "length", "legacy (s)", "current (s)"))
+    for name, string in CASES:
+        current, current_time = timed(string_to_list, string)
+        try:
+            legacy, legacy_time = timed(legacy_string_to_list, string)
+            same = "yes" if legacy == current else "NO"
+            legacy_time = "{:12.4f}".format(legacy_time)
+        except RecursionError:
+            legacy_time = "{:>12}".format("recursion")
+            same = "-"
+        print("{:<26} {:>7} {} {:12.4f}  {}".format(
+            name, len(string), legacy_time, current_time, same))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Benchmark for the numerical rejection probe of compare_functions.
+
+Grades a mix of correct and typical wrong submissions to derivative
+problems with and without the probe (numeric_first) and reports the
+latency distribution. Run from the repository root:
+
+    python benchmarks/bench_numeric_first.py
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from cyllene.MathFunctions.math_compare import compare_functions  # noqa: E402
+from cyllene.MathFunctions.math_define import define_expression  # noqa: E402
+
+
+# reference answer and a mix of submissions (correct ones and common mistakes)
+SUBMISSIONS = {
+    "2x*exp(x^2)": ["2x*exp(x^2)", "exp(x^2)*2x", "exp(x^2)", "2x*exp(2x)",
+                    "x^2*exp(x^2)", "2exp(x^2)"],
+    "cos(x)*x+sin(x)": ["x*cos(x)+sin(x)", "sin(x)+x*cos(x)", "cos(x)",
+                        "-x*sin(x)+cos(x)", "x*cos(x)"],
+    "1/(2sqrt(x+1))": ["1/(2sqrt(x+1))", "(x+1)^(-1/2)/2", "1/sqrt(x+1)",
+                       "1/(2sqrt(x))", "sqrt(x+1)/2"],
+    "3cos(3x)": ["3cos(3x)", "cos(3x)*3", "cos(3x)", "-3cos(3x)",
+                 "3sin(3x)"],
+    "-sin(x)/cos(x)^2": ["-sin(x)/cos(x)^2", "-tan(x)/cos(x)", "sin(x)/cos(x)^2",
+                         "-1/cos(x)^2", "-sin(x)"],
+    "log(x)+1": ["log(x)+1", "1+log(x)", "log(x)", "1/x", "x*log(x)"],
+}
+
+
+def latencies(numeric_first):
+    times = []
+    for reference, answers in SUBMISSIONS.items():
+        g = define_expression(reference)[0]
+        for answer in answers:
+            f = define_expression(answer)[0]
+            start = time.perf_counter()
+            compare_functions(f, g, numeric_first=numeric_first)
+            times.append(time.perf_counter() - start)
+    return np.array(times)
+
+
+def main():
+    # warm up lambdify and simplify
+    latencies(True)
+
+    print("{:<16} {:>9} {:>9} {:>9} {:>9} {:>9}".format(
+        "numeric_first", "mean (s)", "p50 (s)", "p90 (s)", "p99 (s)", "max (s)"))
+    for numeric_first in [False, True]:
+        times = latencies(numeric_first)
+        print("{:<16} {:>9.4f} {:>9.4f} {:>9.4f} {:>9.4f} {:>9.4f}".format(
+            str(numeric_first), times.mean(), *np.percentile(times, [50, 90, 99]),
+            times.max()))
+
+
+if __name__ == "__main__":
+    main()
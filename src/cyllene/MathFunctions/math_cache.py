@@ -0,0 +1,111 @@
+import hashlib
+import threading
+from collections import OrderedDict, namedtuple
+
+import sympy as sp
+
+CacheInfo = namedtuple(
+    "CacheInfo", ["hits", "misses", "evictions", "size", "maxsize", "policy"])
+
+EVICTION_POLICIES = ["lru", "fifo"]
+
+
+class BoundedCache:
+    """
+    Thread-safe dictionary of bounded size.
+
+    When the cache is full, adding a new entry evicts the oldest one.
+    With policy "lru", an entry counts as new again each time it is
+    looked up (least recently used entries are evicted first);
+    with policy "fifo", entries are evicted in insertion order.
+
+    Attributes:
+    -----------
+    maxsize : int
+        maximal number of entries
+    policy : str
+        eviction policy, "lru" or "fifo"
+    hits, misses, evictions : int
+        usage counters
+    """
+
+    def __init__(self, maxsize=1024, policy="lru"):
+
+        if policy not in EVICTION_POLICIES:
+            raise ValueError(str(policy) + " is not a valid eviction policy")
+
+        self.maxsize = maxsize
+        self.policy = policy
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None):
+        """ look up key, count hit or miss """
+
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+
+            self.hits += 1
+            if self.policy == "lru":
+                self._data.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        """ store value under key, evicting old entries if necessary """
+
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """ remove all entries and reset counters """
+
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def info(self):
+        """ return usage statistics as CacheInfo """
+
+        return CacheInfo(self.hits, self.misses, self.evictions,
+                         len(self._data), self.maxsize, self.policy)
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+def expression_key(*args):
+    """
+    canonical key for a tuple of sympy expressions and further
+    (hashable) parameters, based on srepr of the expressions
+    """
+
+    digest = hashlib.blake2b(digest_size=16)
+    for arg in args:
+        if isinstance(arg, sp.Basic):
+            digest.update(sp.srepr(arg).encode())
+        else:
+            digest.update(repr(arg).encode())
+        digest.update(b"\0")
+
+    return digest.hexdigest()
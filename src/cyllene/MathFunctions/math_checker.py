@@ -0,0 +1,200 @@
+import numpy as np
+import sympy as sp
+
+from .math_compare import (
+    PROBE_ERROR_BOUND, PROBE_OVERSAMPLING, PROBE_RANGE, REJECT_ATOL,
+    REJECT_POINTS, REJECT_RTOL, ROUNDING_ERROR, compare_functions,
+    compare_functions_cached, evaluate_lambda, lambdify_numpy,
+    match_variables, probe_size, real_values, refine_grid, rounding_error,
+    sample_grid, term_magnitude, values_close)
+from .math_define import define_expression
+from .math_helpers import get_variables
+
+
+class AnswerChecker:
+    """
+    Compiled form of a problem answer, to check many submissions
+    against it.
+
+    Everything compare_functions computes numerically about the answer
+    is computed once, when the checker is built: the parsed expression,
+    a numpy evaluator, and its values (and hence its numerical domain) on
+    the sample grid and at the random rejection and probe points. The
+    checker is passed to compare_functions (as prepared), which uses
+    these values instead of evaluating the answer again.
+
+    Note that the random probe points are drawn once per checker, so all
+    submissions are tested at the same points.
+
+    Attributes:
+    -----------
+    answer : str or sympy Basic
+        answer the checker was built from
+    expression : sympy Basic
+        parsed answer (None if the answer could not be parsed)
+    variables : list
+        free symbols of the answer, sorted by name
+    lambda_form : function
+        numpy evaluator of the answer
+    grid, grid_values : numpy array
+        sample grid of the numerical test and the answer's values on it
+        (single-variable answers only)
+    """
+
+    def __init__(self, answer, rng=None):
+
+        self.answer = answer
+        self.expression = define_expression(answer)[0]
+        self.variables = []
+        self.lambda_form = None
+        self.grid = None
+        self.grid_values = None
+        self.fine_grid = None
+        self.fine_grid_values = None
+        self.reject_points = None
+        self.reject_values = None
+        self.reject_error = None
+        self.probe_size = 0
+        self.probe_points = None
+        self.probe_values = None
+        self.probe_error = None
+
+        if self.expression is None:
+            return
+
+        self.variables = sorted(get_variables(self.expression), key=str)
+        if not self.variables:
+            return
+
+        if rng is None:
+            rng = np.random.default_rng()
+
+        self.lambda_form = lambdify_numpy(self.expression, self.variables)
+
+        # random points for the rejection test and the probe
+        num_vars = len(self.variables)
+        self.reject_points = rng.uniform(
+            PROBE_RANGE[0], PROBE_RANGE[1], (num_vars, REJECT_POINTS))
+        self.reject_values = self.evaluate(self.reject_points)
+        self.reject_error = rounding_error(
+            self.expression, self.variables, self.reject_points)
+
+        self.probe_size = probe_size(PROBE_ERROR_BOUND)
+        self.probe_points = rng.uniform(
+            PROBE_RANGE[0], PROBE_RANGE[1],
+            (num_vars, PROBE_OVERSAMPLING * self.probe_size))
+        self.probe_values = self.evaluate(self.probe_points)
+        self.probe_error = rounding_error(
+            self.expression, self.variables, self.probe_points)
+
+        # sample grid of the numerical test
+        if num_vars == 1:
+            self.grid = sample_grid()
+            self.grid_values = self.evaluate([self.grid])
+            if self.grid_values is not None:
+                fine_grid = refine_grid(self.grid, self.grid_values)
+                if fine_grid is not None:
+                    self.fine_grid = fine_grid
+                    self.fine_grid_values = self.evaluate([fine_grid])
+
+    def evaluate(self, points):
+        """ evaluate the answer on an array of points (one row per variable) """
+
+        return evaluate_lambda(self.lambda_form, points)
+
+    def compare(self, expr, mode="full", **kwargs):
+        """
+        compare a sympy expression with the answer: compare_functions
+        with the data precomputed by the checker
+
+        Returns True, False, or "undecided".
+        """
+
+        if self.expression is None:
+            return "undecided"
+
+        return compare_functions(expr, self.expression, mode,
+                                 prepared=self, **kwargs)
+
+    def check(self, expr, mode="full", **kwargs):
+        """
+        compare_functions_cached for the answer: look up the verdict in
+        COMPARE_CACHE first, and store it there
+        """
+
+        if self.expression is None:
+            return "undecided"
+
+        return compare_functions_cached(expr, self.expression, mode,
+                                        prepared=self, **kwargs)
+
+    def reject_many(self, expressions):
+        """
+        vectorized rejection test for a list of sympy expressions
+        (which must have the same number of variables as the answer)
+
+        All expressions are evaluated at the rejection points and the
+        resulting matrix (one row per expression) is compared with the
+        answer's values at once. Expressions that differ there are
+        checked once more, allowing for the rounding error of their
+        terms (see reject_numerically). Returns a boolean array, True
+        for the expressions that clearly differ from the answer.
+        """
+
+        if not expressions or self.reject_values is None:
+            return np.zeros(len(expressions), dtype=bool)
+
+        # rename the variables of each expression to those of the answer
+        aligned = {}
+        for index, expr in enumerate(expressions):
+            matched = match_variables(get_variables(expr), self.variables)
+            if matched is not None:
+                aligned[index] = expr.xreplace(
+                    dict(zip(matched[0], self.variables)))
+
+        matrix = self.evaluate_many(aligned, len(expressions))
+        domain = ~np.isnan(matrix) & ~np.isnan(self.reject_values)
+        close = values_close(matrix, self.reject_values,
+                             REJECT_RTOL, REJECT_ATOL)
+        rejected = np.any(domain & ~close, axis=1)
+
+        # only reject if the difference is not rounding error of large terms
+        suspects = {index: term_magnitude(aligned[index])
+                    for index in aligned if rejected[index]}
+        if suspects and self.reject_error is not None:
+            error = ROUNDING_ERROR * self.evaluate_many(
+                suspects, len(expressions)) + self.reject_error
+            error = np.where(np.isnan(error), np.inf, error)
+            close = values_close(matrix, self.reject_values,
+                                 REJECT_RTOL, REJECT_ATOL, error)
+            rejected = np.any(domain & ~close, axis=1)
+
+        return rejected
+
+    def evaluate_many(self, expressions, num_rows):
+        """
+        evaluate sympy expressions in the answer's variables (a
+        dictionary {row: expression}) at the rejection points, with a
+        single lambdified function
+
+        Returns a matrix with num_rows rows, holding the values of each
+        expression in its row and nan elsewhere.
+        """
+
+        matrix = np.full((num_rows, REJECT_POINTS), np.nan)
+        try:
+            lambda_form = sp.lambdify(
+                self.variables, list(expressions.values()), modules="numpy")
+            with np.errstate(all="ignore"):
+                results = lambda_form(*self.reject_points)
+            for index, values in zip(expressions, results):
+                matrix[index] = real_values(values, (REJECT_POINTS,))
+        except Exception:
+            # some expression cannot be evaluated, do them one by one
+            for index, expr in expressions.items():
+                values = evaluate_lambda(
+                    lambdify_numpy(expr, self.variables), self.reject_points)
+                if values is not None:
+                    matrix[index] = values
+
+        return matrix
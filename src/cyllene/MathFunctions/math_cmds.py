@@ -2,13 +2,16 @@ from .math_functionclass import Function
 from .math_define import FUNCTION_LIST
 
 
-def function(expr):
+def function(expr, backend="sympy"):
     """
     Defines a function based on a syntax check
     and a Function object, using lambda operator.
     Returns a pure function.
+
+    The backend used for evaluation can be "sympy" (exact),
+    "math" (fast for single numbers), or "numpy" (accepts arrays).
     """
-    func = Function(expr)
+    func = Function(expr, backend=backend)
 
     if func.is_defined:
         return func.lambda_form
@@ -26,18 +29,19 @@ def function(expr):
         # raise ValueError('Problems encountered:\n'+issues_report)
 
 
-def random_function(arg="random"):
+def random_function(arg="random", backend="sympy"):
     """
     Pick a function at random.
     One of the folliwing types can be specified:
     'const', 'linear', 'quadratic', 'cubic', 'squareroot',
     'cubicroot', 'rational', 'exp', 'tri', 'log', 'comp',
     'random'
+    The backend is as for function().
     """
     if arg in FUNCTION_LIST:
-        func = Function(arg)
+        func = Function(arg, backend=backend)
     else:
-        func = Function("random")
+        func = Function("random", backend=backend)
 
     return func.lambda_form
 
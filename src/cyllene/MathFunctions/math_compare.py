@@ -1,11 +1,671 @@
+from collections import Counter
+
+import numpy as np
 import sympy as sp
 
+from .math_cache import BoundedCache, expression_key
 from .math_helpers import get_variables
 
+# Parameters of the numerical test for equality
+SAMPLE_RANGE = (-100, 100)
+NUM_SAMPLES = 2000
+MIN_SAMPLES = 500
+RTOL = 1e-7
+ATOL = 1e-9
+
+# Parameters of the randomized probe
+PROBE_RANGE = (-10, 10)
+PROBE_ERROR_BOUND = 1e-9
+PROBE_POINT_ERROR = 0.5
+PROBE_OVERSAMPLING = 8
+
+# Parameters of the numerical rejection test
+REJECT_POINTS = 8
+REJECT_RTOL = 1e-4
+REJECT_ATOL = 1e-4
+
+# Rounding errors: a value computed from terms of size m is trusted up
+# to ROUNDING_ERROR * m (a generous multiple of the machine epsilon)
+ROUNDING_ERROR = 64 * np.finfo(float).eps
+
+# Parameters of the modular identity test for rational functions
+PRIME = 2**61 - 1
+MODULAR_TRIALS = 3
+
+# Cache of verdicts of compare_functions_cached
+COMPARE_CACHE = BoundedCache(maxsize=4096, policy="lru")
+
+
+def lambdify_numpy(func, variables):
+    """
+    turn a sympy expression into a function evaluating it on numpy arrays
+
+    variables can be a single sympy symbol or a list of symbols.
+    Returns None if the expression cannot be evaluated numerically.
+    """
+
+    if not isinstance(variables, (list, tuple)):
+        variables = [variables]
+
+    try:
+        return sp.lambdify(variables, func, modules="numpy")
+    except Exception:
+        return None
+
+
+def evaluate_lambda(lambda_func, grid):
+    """
+    evaluate a function returned by lambdify_numpy on a grid
+
+    grid is an array whose rows hold the values of the respective
+    variables. Returns a float array (one value per sample point).
+    Points where the function is undefined or not real are set to nan.
+    """
+
+    if lambda_func is None:
+        return None
+
+    grid = np.asarray(grid, dtype=float)
+
+    try:
+        with np.errstate(all="ignore"):
+            values = lambda_func(*grid)
+        return real_values(values, grid.shape[1:])
+    except Exception:
+        # expression cannot be evaluated numerically
+        return None
+
+
+def real_values(values, shape):
+    """
+    turn the output of a numpy evaluation into a float array of the
+    given shape, with nan wherever the value is not a finite real number
+    """
+
+    # constant expressions return a scalar
+    values = np.broadcast_to(np.asarray(values, dtype=complex), shape)
+
+    result = values.real.copy()
+    result[~np.isfinite(values) | (np.abs(values.imag) > ATOL)] = np.nan
+
+    return result
+
+
+def evaluate_on_grid(func, variables, grid):
+    """
+    evaluate a sympy expression on a numpy array of sample points
+
+    variables can be a single sympy symbol or a list of symbols. In the
+    latter case, grid is an array whose rows hold the values of the
+    respective variables.
+
+    Returns a float array (one value per sample point). Points where the
+    expression is undefined or not real are set to nan.
+    """
+
+    if not isinstance(variables, (list, tuple)):
+        variables = [variables]
+        grid = [grid]
+
+    return evaluate_lambda(lambdify_numpy(func, variables), grid)
+
+
+def compare_samples(values_1, values_2, min_samples, rtol=RTOL, atol=ATOL):
+    """
+    compare the values of two expressions at the same sample points
+
+    The expressions are different if one of them is defined (not nan)
+    at a point where the other one is not, or if their values differ by
+    more than the given tolerances (see numpy.isclose). If they agree
+    at min_samples or more points, they are considered equal.
+
+    Returns True, False, or "undecided".
+    """
+
+    if values_1 is None or values_2 is None:
+        return "undecided"
+
+    domain_1 = ~np.isnan(values_1)
+    domain_2 = ~np.isnan(values_2)
+
+    if np.any(domain_1 != domain_2):
+        return False
+
+    if not np.allclose(values_1[domain_1], values_2[domain_1],
+                       rtol=rtol, atol=atol):
+        return False
+
+    if np.count_nonzero(domain_1) >= min_samples:
+        return True
+
+    return "undecided"
+
+
+def values_close(values_1, values_2, rtol=RTOL, atol=ATOL, error=None):
+    """
+    pointwise test whether two arrays of values agree up to the given
+    tolerances (see numpy.isclose) plus an estimate of the rounding
+    error at each point (see rounding_error)
+    """
+
+    tolerance = atol + rtol * np.abs(values_2)
+    if error is not None:
+        tolerance = tolerance + error
+
+    with np.errstate(invalid="ignore"):
+        return np.abs(values_1 - values_2) <= tolerance
+
+
+def probe_samples(values_1, values_2, min_samples, rtol=RTOL, atol=ATOL,
+                  error=None):
+    """
+    compare the values of two expressions at random probe points
+
+    The values are compared on the common domain of the expressions,
+    up to the given tolerances and the estimated rounding error (if
+    given, see rounding_error). The expressions are different if their
+    values differ at some point of the common domain. They are
+    considered equal only if they are defined at the same points and
+    agree at min_samples or more of them; differences of the domains
+    are left to the later stages.
+
+    Returns True, False, or "undecided".
+    """
+
+    if values_1 is None or values_2 is None:
+        return "undecided"
+
+    domain_1 = ~np.isnan(values_1)
+    domain_2 = ~np.isnan(values_2)
+    domain = domain_1 & domain_2
+
+    close = values_close(values_1, values_2, rtol, atol, error)
+    if not np.all(close[domain]):
+        return False
+
+    if np.any(domain_1 != domain_2):
+        return "undecided"
+
+    if np.count_nonzero(domain) >= min_samples:
+        return True
+
+    return "undecided"
+
+
+def term_magnitude(func):
+    """
+    sympy expression bounding the size of the intermediate results
+    when func is evaluated: sums and products of the absolute values
+    of its terms and factors
+    """
+
+    if isinstance(func, (sp.Add, sp.Mul)):
+        return func.func(*[term_magnitude(arg) for arg in func.args])
+
+    if isinstance(func, sp.Pow) and func.exp.is_Integer and func.exp > 0:
+        return term_magnitude(func.base) ** func.exp
+
+    return sp.Abs(func)
+
+
+def rounding_error(func, variables, points):
+    """
+    estimate of the rounding error in the values of a sympy expression
+    at the given points
+
+    The estimate is proportional to the magnitude of the terms of the
+    expression (see term_magnitude), which can be much larger than its
+    values if the terms cancel (for instance in expanded powers).
+    Returns an array (nan where the estimate is not defined), or None.
+    """
+
+    magnitudes = evaluate_on_grid(term_magnitude(func), variables, points)
+    if magnitudes is None:
+        return None
+
+    return ROUNDING_ERROR * magnitudes
+
+
+def differ_clearly(values_1, values_2, rtol=REJECT_RTOL, atol=REJECT_ATOL,
+                   error=None):
+    """
+    check whether the values of two expressions at the same sample
+    points differ at some point where both are defined, by more than
+    the tolerances and the estimated rounding error (if given, see
+    rounding_error; points without an estimate never count)
+    """
+
+    if values_1 is None or values_2 is None:
+        return False
+
+    domain = ~np.isnan(values_1) & ~np.isnan(values_2)
+
+    if error is not None:
+        error = np.where(np.isnan(error), np.inf, error)
+
+    close = values_close(values_1, values_2, rtol, atol, error)
+
+    return bool(np.any(domain & ~close))
+
+
+def sample_grid(sample_range=SAMPLE_RANGE, num_samples=NUM_SAMPLES):
+    """ equidistant grid of sample points """
+
+    return np.linspace(sample_range[0], sample_range[1], num_samples)
+
+
+def refine_grid(grid, values):
+    """
+    if an expression (given by its values on grid) is defined only on a
+    small part of the grid, return a grid of the same size spanning that
+    part; otherwise return None
+    """
+
+    domain = ~np.isnan(values)
+
+    if 0 < np.count_nonzero(domain) < MIN_SAMPLES:
+        inf = grid[domain].min()
+        sup = grid[domain].max()
+        if inf < sup:
+            return sample_grid((inf, sup), len(grid))
+
+    return None
+
+
+def compare_numerically(func_1, func_2, var_1, var_2,
+                        sample_range=SAMPLE_RANGE, num_samples=NUM_SAMPLES,
+                        rtol=RTOL, atol=ATOL, prepared=None):
+    """
+    compare two sympy expressions in one variable numerically
+    on a grid of equidistant points
+
+    Both expressions are evaluated on the whole grid at once. The domain
+    of each expression is given by the points at which it evaluates to a
+    finite real number. The expressions are considered different if their
+    domains differ on the grid or if their values differ by more than the
+    given tolerances (see numpy.isclose). If the domain is a small part
+    of the sample range, the grid is refined (once) to lie within it.
+
+    If prepared (an AnswerChecker for func_2) is given, its grid and
+    values are used instead of evaluating func_2.
+
+    Returns True, False, or "undecided" (if the common domain does not
+    contain enough sample points).
+    """
+
+    lambda_1 = lambdify_numpy(func_1, var_1)
+
+    if prepared is not None and prepared.grid is not None:
+        grid = prepared.grid
+        values_2 = prepared.grid_values
+    else:
+        prepared = None
+        lambda_2 = lambdify_numpy(func_2, var_2)
+        grid = sample_grid(sample_range, num_samples)
+        values_2 = evaluate_lambda(lambda_2, [grid])
+
+    values_1 = evaluate_lambda(lambda_1, [grid])
+
+    check = compare_samples(values_1, values_2, 0, rtol, atol)
+    if check is not True:
+        return check
+
+    fine_grid = refine_grid(grid, values_2)
+    if fine_grid is not None:
+        values_1 = evaluate_lambda(lambda_1, [fine_grid])
+        if prepared is not None:
+            values_2 = prepared.fine_grid_values
+        else:
+            values_2 = evaluate_lambda(lambda_2, [fine_grid])
+
+    return compare_samples(values_1, values_2, MIN_SAMPLES, rtol, atol)
+
+
+def compare_constants(func_1, func_2, rtol=RTOL, atol=ATOL):
+    """
+    numerically compare two sympy expressions without free symbols
+    """
+
+    try:
+        if np.isclose(float(func_1), float(func_2), rtol=rtol, atol=atol):
+            return True
+    except:
+        return False
+
+    return "undecided"
+
+
+def probe_size(error_bound=PROBE_ERROR_BOUND, point_error=PROBE_POINT_ERROR):
+    """
+    number of random points needed so that two different expressions
+    agree at all of them with probability at most error_bound,
+    assuming they agree at a single random point with probability
+    at most point_error
+    """
+
+    return max(1, int(np.ceil(np.log(error_bound) / np.log(point_error))))
+
+
+def match_variables(var_1, var_2):
+    """
+    pair up the variables of two expressions
+
+    A single variable is paired with a single variable regardless of
+    its name. Otherwise, variables are paired by name. Returns two lists
+    of symbols in matching order, or None if the names do not match.
+    """
+
+    if len(var_1) == 1 and len(var_2) == 1:
+        return list(var_1), list(var_2)
+
+    var_1 = sorted(var_1, key=str)
+    var_2 = sorted(var_2, key=str)
+
+    if [str(v) for v in var_1] != [str(v) for v in var_2]:
+        return None
+
+    return var_1, var_2
+
+
+def probe_functions(func_1, func_2, var_1, var_2,
+                    error_bound=PROBE_ERROR_BOUND, sample_range=PROBE_RANGE,
+                    rtol=RTOL, atol=ATOL, rng=None, prepared=None):
+    """
+    randomized identity test for two sympy expressions in any number
+    of variables (in the style of Schwartz-Zippel)
+
+    Random real points are drawn uniformly from sample_range in every
+    variable and both expressions are evaluated at all of them in one
+    batch. If the expressions differ at some point of the common domain
+    (beyond the tolerances and the rounding error of their terms), they
+    are different. If they have the same domain and agree at enough
+    points to push the probability of a false positive below error_bound
+    (see probe_size), they are considered equivalent (see probe_samples).
+
+    If prepared (an AnswerChecker for func_2) is given, its probe points
+    and values are used instead of drawing new ones (provided they
+    suffice for error_bound).
+
+    Returns True, False, or "undecided" (if the variables cannot be
+    matched or too few points lie in the common domain).
+    """
+
+    variables = match_variables(var_1, var_2)
+    if variables is None:
+        return "undecided"
+
+    size = probe_size(error_bound)
+
+    error_2 = None
+    if prepared is not None and prepared.probe_size >= size:
+        points = prepared.probe_points
+        values_2 = prepared.probe_values
+        error_2 = prepared.probe_error
+        size = prepared.probe_size
+    else:
+        if rng is None:
+            rng = np.random.default_rng()
+        points = rng.uniform(sample_range[0], sample_range[1],
+                             (len(variables[0]), PROBE_OVERSAMPLING * size))
+        values_2 = evaluate_on_grid(func_2, variables[1], points)
+
+    values_1 = evaluate_on_grid(func_1, variables[0], points)
+
+    check = probe_samples(values_1, values_2, size, rtol, atol)
+    if check is False:
+        # the difference may only be rounding error of large terms
+        error_1 = rounding_error(func_1, variables[0], points)
+        if error_2 is None:
+            error_2 = rounding_error(func_2, variables[1], points)
+        if error_1 is not None and error_2 is not None:
+            check = probe_samples(values_1, values_2, size, rtol, atol,
+                                  error_1 + error_2)
+
+    return check
+
+
+def evaluate_modular(expr, values, prime=PRIME):
+    """
+    evaluate a rational function with rational coefficients modulo
+    a prime
+
+    values is a dictionary assigning residues to the free symbols of expr.
+    Returns a pair (numerator, denominator) of residues, or None if expr
+    is not a rational function with rational coefficients.
+    """
+
+    if isinstance(expr, sp.Rational):
+        return expr.p % prime, expr.q % prime
+
+    if isinstance(expr, sp.Symbol):
+        return values[expr], 1
+
+    if isinstance(expr, (sp.Add, sp.Mul)):
+        num, den = (0, 1) if isinstance(expr, sp.Add) else (1, 1)
+        for arg in expr.args:
+            value = evaluate_modular(arg, values, prime)
+            if value is None:
+                return None
+            if isinstance(expr, sp.Add):
+                num = (num * value[1] + value[0] * den) % prime
+            else:
+                num = (num * value[0]) % prime
+            den = (den * value[1]) % prime
+        return num, den
+
+    if isinstance(expr, sp.Pow) and isinstance(expr.exp, sp.Integer):
+        value = evaluate_modular(expr.base, values, prime)
+        if value is None:
+            return None
+        exponent = int(expr.exp)
+        if exponent < 0:
+            value = value[1], value[0]
+            exponent = -exponent
+        return pow(value[0], exponent, prime), pow(value[1], exponent, prime)
+
+    return None
+
+
+def compare_modular(func_1, func_2, var_1, var_2,
+                    prime=PRIME, trials=MODULAR_TRIALS, rng=None):
+    """
+    exact probabilistic identity test for rational functions
+
+    Both expressions are evaluated at random points modulo a large prime.
+    Rational functions f = p_1/q_1 and g = p_2/q_2 agree at a point if
+    p_1*q_2 = p_2*q_1 there. If f and g are different, this happens
+    with probability at most deg/prime at a random point (Schwartz-Zippel).
+
+    Returns True or False, or None if one of the expressions is not a
+    rational function with rational coefficients or no point avoiding
+    the poles could be found.
+    """
+
+    variables = match_variables(var_1, var_2)
+    if variables is None:
+        return None
+
+    if rng is None:
+        rng = np.random.default_rng()
+
+    checked = 0
+    for _ in range(2 * trials):
+        residues = [int(r) for r in rng.integers(prime, size=len(variables[0]))]
+        value_1 = evaluate_modular(
+            func_1, dict(zip(variables[0], residues)), prime)
+        if value_1 is None:
+            return None
+        value_2 = evaluate_modular(
+            func_2, dict(zip(variables[1], residues)), prime)
+        if value_2 is None:
+            return None
+
+        if value_1[1] == 0 or value_2[1] == 0:
+            # hit a pole, try another point
+            continue
+
+        if (value_1[0] * value_2[1] - value_2[0] * value_1[1]) % prime != 0:
+            return False
+
+        checked += 1
+        if checked == trials:
+            return True
+
+    return None
+
+
+def reject_numerically(func_1, func_2, var_1, var_2,
+                       num_points=REJECT_POINTS, sample_range=PROBE_RANGE,
+                       rtol=REJECT_RTOL, atol=REJECT_ATOL, rng=None,
+                       prepared=None):
+    """
+    cheap test whether two sympy expressions are clearly different
+
+    Both expressions are evaluated at a few random points. Returns True
+    if at some point both are defined and their values differ by more
+    than the (loose) tolerances and the estimated rounding error of
+    their terms, and False otherwise (in particular, if no conclusion
+    can be drawn).
+
+    If prepared (an AnswerChecker for func_2) is given, its rejection
+    points and values are used instead.
+    """
+
+    variables = match_variables(var_1, var_2)
+    if variables is None:
+        return False
+
+    error_2 = None
+    if prepared is not None:
+        points = prepared.reject_points
+        values_2 = prepared.reject_values
+        error_2 = prepared.reject_error
+    else:
+        if rng is None:
+            rng = np.random.default_rng()
+        points = rng.uniform(sample_range[0], sample_range[1],
+                             (len(variables[0]), num_points))
+        values_2 = evaluate_on_grid(func_2, variables[1], points)
+
+    values_1 = evaluate_on_grid(func_1, variables[0], points)
+
+    if not differ_clearly(values_1, values_2, rtol, atol):
+        return False
+
+    # only reject if the difference is not rounding error of large terms
+    error_1 = rounding_error(func_1, variables[0], points)
+    if error_2 is None:
+        error_2 = rounding_error(func_2, variables[1], points)
+    if error_1 is None or error_2 is None:
+        return False
+
+    return differ_clearly(values_1, values_2, rtol, atol, error_1 + error_2)
+
+
+def canonical_term(term):
+    """
+    canonical form of a single term, used to match terms by hashing
+
+    The term is expanded (which also sorts factors and collects numeric
+    coefficients) and floats are turned into rationals.
+    """
+
+    term = sp.expand(term)
+    floats = term.atoms(sp.Float)
+    if floats:
+        term = term.xreplace(
+            {f: sp.nsimplify(f, rational=True) for f in floats})
+
+    return term
+
+
+def compare_terms(func_1, func_2):
+    """
+    check whether two sympy expressions have the same terms
+    (up to simplification of each term)
+
+    Terms are matched as multisets of their canonical forms. Only terms
+    left unmatched are compared pairwise using simplify.
+    """
+
+    # decompose both functions into terms
+    f_terms = sp.Add.make_args(func_1)
+    g_terms = sp.Add.make_args(func_2)
+
+    # if number of terms different, there is no match
+    if len(f_terms) != len(g_terms):
+        return False
+
+    # match canonical forms of terms
+    g_canonical = Counter(canonical_term(term) for term in g_terms)
+    f_left = []
+    for term in f_terms:
+        key = canonical_term(term)
+        if g_canonical[key] > 0:
+            g_canonical[key] -= 1
+        else:
+            f_left.append(key)
+
+    # fall back to simplify for the remaining terms
+    g_left = list(g_canonical.elements())
+    for f_term in f_left:
+        for j, g_term in enumerate(g_left):
+            if sp.simplify(f_term - g_term) == 0:
+                del g_left[j]
+                break
+        else:
+            return False
+
+    # all terms have matches
+    return True
+
+
+def compare_symbolic(func_1, func_2):
+    """
+    check whether sympy can simplify the difference
+    of two expressions to 0
+    """
+
+    return sp.simplify((func_1 - func_2).expand(force=True)) == 0
 
-def compare_functions(func_1, func_2, mode="full"):
+
+def run_directly(stage_name, stage, *args):
+    """
+    default way of running a stage of compare_functions
+    """
+
+    return stage(*args)
+
+
+def compare_functions(func_1, func_2, mode="full", rtol=RTOL, atol=ATOL,
+                      error_bound=PROBE_ERROR_BOUND, numeric_first=True,
+                      run_stage=run_directly, prepared=None):
     """
     check whether two sympy expressions are equivalent
+
+    modes:
+        "strict": expressions have to be literally equal
+        "terms": expressions have to agree term by term
+        "symbolic": difference has to simplify to 0 (rational functions
+            are compared exactly modulo a prime instead)
+        "probe": randomized numerical identity test only
+        "full": all of the above, followed by a numerical test
+
+    rtol and atol are the relative and absolute tolerances
+    used in the numerical tests for equality, error_bound is the
+    admissible probability of a false positive in the randomized probe
+
+    If numeric_first is True, both expressions are evaluated at a few
+    random points before any symbolic work, and clearly different
+    values lead to an immediate rejection.
+
+    The expensive symbolic stages ("terms" and "symbolic") are called
+    through run_stage(stage_name, stage, *args), which can be replaced
+    to control how they are run (see math_compare_timed).
+
+    prepared can be an AnswerChecker for func_2 (see math_checker): the
+    numerical stages then use its precomputed points and values of
+    func_2 instead of evaluating func_2 again.
     """
 
     # if both expressions are numbers, simply check for equality
@@ -14,9 +674,10 @@ def compare_functions(func_1, func_2, mode="full"):
 
     # get variables
     var_1 = get_variables(func_1)
-    var_2 = get_variables(func_2)
-
-    print(var_1)
+    if prepared is not None:
+        var_2 = prepared.variables
+    else:
+        var_2 = get_variables(func_2)
 
     # if the functions have different number of free symbols, stop right away
     if len(var_1) != len(var_2):
@@ -29,46 +690,47 @@ def compare_functions(func_1, func_2, mode="full"):
     elif mode == "strict":
         return False
 
-    # if mode is "terms", check whether they have the same terms
-
-    # decompose both functions into terms
-    f = func_1.as_terms()
-    g = func_2.as_terms()
+    # in probe mode, skip the symbolic stages altogether
+    if mode == "probe":
+        if len(var_1) == 0:
+            return compare_constants(func_1, func_2, rtol, atol)
+        return probe_functions(func_1, func_2, var_1, var_2,
+                               error_bound, rtol=rtol, atol=atol,
+                               prepared=prepared)
 
-    # if number of terms different but we require equal terms, return False
-    if len(f[0]) != len(g[0]):
+    # For polynomials and rational functions, an exact test modulo
+    # a prime is decisive and avoids simplify.
+    if mode in ["full", "symbolic"]:
+        check = compare_modular(func_1, func_2, var_1, var_2)
+        if check is not None:
+            return check
 
-        if mode == 'terms':
+    # Most wrong answers differ at almost every point, so reject them
+    # before running the expensive symbolic stages.
+    if numeric_first and len(var_1) > 0:
+        if reject_numerically(func_1, func_2, var_1, var_2,
+                              prepared=prepared):
             return False
 
-    else:
-        # generate lists of terms
-        f_terms = [sp.sympify(f[0][i][0]) for i in range(len(f[0]))]
-        g_terms = [sp.sympify(g[0][i][0]) for i in range(len(f[0]))]
-
-        # loop through terms and try to find match
-        num = len(f[0])
-        for i in range(len(f[0])):
-            if num == 0:
-                return True
-            for j in range(num):
-                if sp.simplify(f_terms[i] - g_terms[j]) == 0:
-                    num = num - 1
-                    del g_terms[j]
-                    break
-                else:
-                    pass
-
-        # all terms have matches
-        if num == 0:
-            return True
+    # if mode is "terms", check whether they have the same terms
+    if run_stage("terms", compare_terms, func_1, func_2):
+        return True
 
     # if we haven't returned True so far and mode is 'terms', return False
     if mode == "terms":
         return False
 
+    # For several variables, a randomized probe is much cheaper than
+    # simplify. Only if it is inconclusive, try the symbolic route.
+    if mode == "full" and len(var_1) > 1:
+        check = probe_functions(func_1, func_2, var_1, var_2,
+                                error_bound, rtol=rtol, atol=atol,
+                                prepared=prepared)
+        if isinstance(check, bool):
+            return check
+
     # Now check whether Sympy can simplify difference to 0
-    if sp.simplify((func_1 - func_2).expand(force=True)) == 0:
+    if run_stage("symbolic", compare_symbolic, func_1, func_2):
         return True
 
     # If mode is 'symbolic', this is all we can do
@@ -76,37 +738,36 @@ def compare_functions(func_1, func_2, mode="full"):
         return False
 
     # Finally, perform a numerical test for equality.
-    # Test 2000 equidistant points.
+    # Evaluate both functions on 2000 equidistant points.
     if len(var_1) == 0:
-        try:
-            if float(func_1) == float(func_2):
-                return True
-        except:
-            return False
+        return compare_constants(func_1, func_2, rtol, atol)
 
     elif len(var_1) == 1:
-        d1 = sp.calculus.util.continuous_domain(func_1, var_1[0], sp.S.Reals)
-        d2 = sp.calculus.util.continuous_domain(func_2, var_2[0], sp.S.Reals)
-        if d1 != d2:
-            return False
-        inf = d1.inf
-        sup = d1.sup
-        if inf == -sp.oo:
-            inf = -100
-        if sup == sp.oo:
-            sup = 100
-        sample = []
-        h = (sup - inf) / 2000
-        for i in range(2000):
-            p = inf + (i * h)
-            if d1.contains(p):
-                sample.append(p)
-                if func_1.subs(var_1[0], p) != func_2.subs(var_2[0], p):
-                    return False
-        if len(sample) > 500:
-            return True
+        return compare_numerically(func_1, func_2, var_1[0], var_2[0],
+                                   rtol=rtol, atol=atol, prepared=prepared)
 
     """
     Not able to detect any difference between the functions.
     """
     return "undecided"
+
+
+def compare_functions_cached(func_1, func_2, mode="full", **kwargs):
+    """
+    compare_functions with a memo of previous verdicts
+
+    Verdicts are stored in COMPARE_CACHE, keyed by the srepr of both
+    expressions, the mode and any further keyword arguments (except
+    prepared, which does not change the verdict).
+    Use COMPARE_CACHE.info() for hit/miss statistics.
+    """
+
+    options = sorted((k, v) for k, v in kwargs.items() if k != "prepared")
+    key = expression_key(func_1, func_2, mode, options)
+
+    check = COMPARE_CACHE.get(key)
+    if check is None:
+        check = compare_functions(func_1, func_2, mode, **kwargs)
+        COMPARE_CACHE.put(key, check)
+
+    return check
@@ -0,0 +1,193 @@
+import multiprocessing
+import threading
+import time
+from collections import namedtuple
+
+from .math_cache import expression_key
+from .math_compare import compare_functions, COMPARE_CACHE
+
+# Default time budgets (in seconds)
+STAGE_TIMEOUT = 5
+TOTAL_TIMEOUT = 15
+
+Verdict = namedtuple("Verdict", ["result", "stage", "elapsed"])
+
+
+class WorkerError(Exception):
+    """ the worker process died or could not send back a stage result """
+
+
+def _worker_loop(conn):
+    """
+    main loop of the worker process: receive a stage and its arguments,
+    send back the result (or the exception raised, or None and an error
+    message if the result cannot be sent)
+    """
+
+    while True:
+        try:
+            stage, args = conn.recv()
+        except EOFError:
+            break
+
+        try:
+            result = (True, stage(*args))
+        except Exception as e:
+            result = (False, e)
+
+        try:
+            conn.send(result)
+        except Exception as e:
+            # the result (or exception) cannot be pickled
+            conn.send((None, repr(e)))
+
+
+class ComparisonEngine:
+    """
+    Runs compare_functions with a time budget.
+
+    The cheap (numerical and modular) stages run in the current process.
+    The symbolic stages, which call sympy's simplify and can run for
+    minutes on pathological input, are sent to a worker process. If a
+    stage exceeds its time limit, the worker is killed (and restarted
+    when needed) and a "timeout" verdict is returned. If the worker
+    dies during a stage, an "error" verdict is returned.
+
+    The worker runs one stage at a time: threads using the same engine
+    wait for each other's stages (see run_stage).
+
+    Attributes:
+    -----------
+    stage_timeout : float
+        maximal time (in seconds) for a single symbolic stage
+    total_timeout : float
+        maximal time (in seconds) for the whole comparison
+    """
+
+    def __init__(self, stage_timeout=STAGE_TIMEOUT, total_timeout=TOTAL_TIMEOUT):
+
+        self.stage_timeout = stage_timeout
+        self.total_timeout = total_timeout
+        self._process = None
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """ start the worker process (if not running already) """
+
+        if self._process is not None and self._process.is_alive():
+            return
+
+        self._conn, child_conn = multiprocessing.Pipe()
+        self._process = multiprocessing.Process(
+            target=_worker_loop, args=(child_conn,), daemon=True)
+        self._process.start()
+        child_conn.close()
+
+    def stop(self):
+        """ kill the worker process """
+
+        if self._process is not None:
+            self._process.kill()
+            self._process.join()
+            self._conn.close()
+
+        self._process = None
+        self._conn = None
+
+    def run_stage(self, stage_name, stage, *args, deadline=None):
+        """
+        run a stage of compare_functions in the worker process
+
+        Raises TimeoutError (with the stage name as argument) if the stage
+        does not finish before the stage timeout or the deadline, and
+        WorkerError (likewise) if the worker process dies.
+        Stages are sent to the worker one at a time (under a lock), so
+        that concurrent callers do not receive each other's results.
+        """
+
+        with self._lock:
+            timeout = self.stage_timeout
+            if deadline is not None:
+                timeout = min(timeout, deadline - time.monotonic())
+            if timeout <= 0:
+                raise TimeoutError(stage_name)
+
+            self.start()
+            try:
+                self._conn.send((stage, args))
+                finished = self._conn.poll(timeout)
+                if finished:
+                    ok, result = self._conn.recv()
+            except (EOFError, OSError):
+                # the worker died (or its pipe broke)
+                self.stop()
+                raise WorkerError(stage_name)
+
+            if not finished:
+                # runaway computation: kill the worker
+                self.stop()
+                raise TimeoutError(stage_name)
+
+        if ok is None:
+            raise WorkerError(stage_name, result)
+        if not ok:
+            raise result
+
+        return result
+
+    def compare(self, func_1, func_2, mode="full", **kwargs):
+        """
+        compare two sympy expressions within the time budget
+
+        Returns a Verdict (result, stage, elapsed), where result is
+        True, False, "undecided", "timeout", or "error", and stage is the
+        name of the stage that ran out of time or lost its worker (None
+        otherwise).
+        """
+
+        start = time.monotonic()
+        deadline = start + self.total_timeout
+
+        def run_stage(stage_name, stage, *args):
+            return self.run_stage(stage_name, stage, *args, deadline=deadline)
+
+        try:
+            result = compare_functions(
+                func_1, func_2, mode, run_stage=run_stage, **kwargs)
+            stage = None
+        except TimeoutError as e:
+            result = "timeout"
+            stage = e.args[0]
+        except WorkerError as e:
+            result = "error"
+            stage = e.args[0]
+
+        return Verdict(result, stage, time.monotonic() - start)
+
+
+# Engine used by compare_functions_timed
+ENGINE = ComparisonEngine()
+
+
+def compare_functions_timed(func_1, func_2, mode="full", **kwargs):
+    """
+    compare_functions with the time budget of ENGINE
+
+    Looks up and stores verdicts in COMPARE_CACHE (the same cache as
+    compare_functions_cached); "timeout" and "error" verdicts are not
+    stored.
+    Returns a Verdict (result, stage, elapsed).
+    """
+
+    key = expression_key(func_1, func_2, mode, sorted(kwargs.items()))
+
+    check = COMPARE_CACHE.get(key)
+    if check is not None:
+        return Verdict(check, None, 0.0)
+
+    verdict = ENGINE.compare(func_1, func_2, mode, **kwargs)
+    if verdict.result not in ["timeout", "error"]:
+        COMPARE_CACHE.put(key, verdict.result)
+
+    return verdict
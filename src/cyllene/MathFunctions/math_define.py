@@ -6,6 +6,8 @@ from sympy.parsing.sympy_parser import (
     convert_xor,
 )
 import random
+from .math_cache import BoundedCache
+from .math_lambdify import compile_function
 from .math_randomfunction import set_function_random
 
 FUNCTION_LIST = [
@@ -27,6 +29,59 @@ FUNCTION_LIST = [
 a, b, c, d, p, q, r, s, t, w, x, y, z = sp.symbols(
     'a b c d p q r s t w x y z', real=True)
 
+# Transformations used by the parser
+TRANSFORMATIONS = standard_transformations + (
+    convert_xor,
+    implicit_multiplication_application,
+)
+
+# Cache of parsed strings, keyed by (string, contents of the locals dict,
+# eval_mode). Entries are 1-tuples, so that failed parses (None) are
+# cached as well.
+PARSE_CACHE = BoundedCache(maxsize=8192, policy="lru")
+
+
+def parse_key(expr, mylocals, eval_mode):
+    # key of a parse in PARSE_CACHE, or None if the locals dict
+    # cannot be hashed (such parses are not cached)
+    if mylocals is None:
+        return expr, None, eval_mode
+    try:
+        items = frozenset(mylocals.items())
+    except TypeError:
+        return None
+    return expr, items, eval_mode
+
+
+def parse_string(expr, mylocals=None, eval_mode=False):
+    """
+    parse a math string into a sympy expression, using PARSE_CACHE
+
+    Returns the (shared) sympy expression, or None if the string cannot
+    be parsed. Use PARSE_CACHE.info() for hit rate statistics.
+    """
+
+    key = parse_key(expr, mylocals, eval_mode)
+    if key is not None:
+        entry = PARSE_CACHE.get(key)
+        if entry is not None:
+            return entry[0]
+
+    try:
+        new_expr = parse_expr(
+            expr,
+            local_dict=mylocals,
+            transformations=TRANSFORMATIONS,
+            evaluate=False,
+        )
+    except:
+        new_expr = None
+
+    if key is not None:
+        PARSE_CACHE.put(key, (new_expr,))
+
+    return new_expr
+
 
 def define_expression(expr, mylocals=None, eval_mode=False):
     """
@@ -133,23 +188,13 @@ def define_expression(expr, mylocals=None, eval_mode=False):
         #             # returns triple:
         #             #   ['sanitized' string, compilable flag (boolean), issues list]
 
-        try:
-
-            new_expr = parse_expr(
-                expr,
-                local_dict=mylocals,
-                transformations=standard_transformations
-                + (
-                    convert_xor,
-                    implicit_multiplication_application,
-                ),
-                evaluate=False,
-            )
+        new_expr = parse_string(expr, mylocals, eval_mode)
 
+        if new_expr is not None:
             # new_expr = sp.sympify(expr, locals=mylocals)
             expr_ok = True
 
-        except:
+        else:
             expr_ok = False
             issues = ["invalid syntax"]
 
@@ -207,11 +252,11 @@ def define_function(expr, mode="numerical"):
         if mode == "numerical":
             if len(func.free_symbols) > 0:
                 # if there free symbols in func, use the first as the function var
-                return sp.lambdify([func.free_symbols.pop()], func)
+                return compile_function(func, [func.free_symbols.pop()], "numpy")
             #     return lambda u: func.evalf(subs={x, u}, n=5)
             else:
                 # otherwise any symbol will do
-                return sp.lambdify([x], func)
+                return compile_function(func, [x], "numpy")
                 # return lambda u: func.evalf(subs={x, u}, n=5)
 
         else:
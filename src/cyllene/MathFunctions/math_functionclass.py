@@ -1,7 +1,11 @@
+from functools import cached_property
+
 import sympy as sp
 
-from .math_listform import string_to_list
+from .math_listform import sympy_to_list
+from .math_listnode import ListNode
 from .math_define import define_expression
+from .math_lambdify import compile_function
 
 
 class Function:
@@ -15,10 +19,11 @@ class Function:
     - graph
     """
 
-    def __init__(self, expr, variable="x", mylocals=None):
+    def __init__(self, expr, variable="x", mylocals=None, backend="sympy"):
 
         self.variable = sp.Symbol(variable, real=True)
         self.locals = mylocals
+        self.backend = backend
 
         # try:
 
@@ -45,10 +50,8 @@ class Function:
             new_expr = sp.sympify(0)
 
         # Initialize all basic function attributes
+        # (derived forms are computed on first access, see below)
         self.sym_form = new_expr
-        self.str_form = str(new_expr).replace("**", "^")
-        self.list_form = string_to_list(self.str_form)
-        self.tex_form = sp.latex(self.sym_form)
         self.table_form = {}
         # self.graph_form = plt.figure()
 
@@ -59,8 +62,6 @@ class Function:
         # self.variables = [MYLOCALS_LAMBDA[var_string] for var_string in string_variables] # do this to sort variables alphabetically
 
         # self.variables = fa.get_variables(self.sym_form)
-        self.lambda_form = sp.lambdify(
-            self.variable, self.sym_form, modules="sympy")
 
         # parameters for piecewise functions (currently not activated)
         # self.breakpoints = {}
@@ -74,6 +75,27 @@ class Function:
         """
         # self.domain = fa.get_domain(self.sym_form)
 
+    @cached_property
+    def str_form(self):
+        return str(self.sym_form).replace("**", "^")
+
+    @cached_property
+    def list_form(self):
+        return sympy_to_list(self.sym_form)
+
+    @cached_property
+    def node_form(self):
+        # list form as (shared) ListNode tree
+        return ListNode.from_list(sympy_to_list(self.sym_form))
+
+    @cached_property
+    def tex_form(self):
+        return sp.latex(self.sym_form)
+
+    @cached_property
+    def lambda_form(self):
+        return compile_function(self.sym_form, self.variable, self.backend)
+
     def __add__(a, b):
         c = Function(a.sym_form + b.sym_form)
         return c
@@ -1,4 +1,6 @@
+import numpy as np
 import sympy as sp
+from .math_listnode import ListNode
 from .math_string import is_number
 
 # Reserve some (real-valued) symbols in Sympy
@@ -8,13 +10,21 @@ a, b, c, d, p, q, r, s, t, w, x, y, z = sp.symbols(
 MYLOCALS = {'a': a, 'b': b, 'c': c, 'd': d, 'p': p, 'q': q, 'r': r,
             's': s, 't': t, 'w': w, 'x': x, 'y': y, 'z': z}
 
+# Imaginary parts (relative to the real part) below IMAG_TOL are treated
+# as numerical noise by remove_complex
+IMAG_TOL = 1e-10
+
 
 def get_variables_from_list_form(list_form):
     '''
     Accepts a list form of a function (as given by string_to_list)
     and returns a list of all variables
     without duplicates.
+    For a ListNode, this is the variable set stored in the node.
     '''
+    if isinstance(list_form, ListNode):
+        return list(list_form.variables)
+
     var = list(set(get_variables_with_duplicates(list_form)))
     return var
 
@@ -82,16 +92,31 @@ def get_domain(expr):
 
 
 def remove_complex(mylist):
-    """ returns a list that is free of complex valued entries """
+    """
+    returns a list that is free of complex valued entries
+
+    If mylist is a numpy array, the real parts of the real entries
+    are returned as numpy array.
+    """
+
+    values = np.asarray(mylist, dtype=complex)
+    # treat very small complex parts as real
+    # (due to numerics)
+    real = np.abs(values.imag) < IMAG_TOL * np.maximum(1, np.abs(values.real))
 
-    new_list = []
-    for r in mylist:
-        # treat very small complex parts as real
-        # (due to numerics)
-        if round(sp.N(r), 10).is_real:
-            new_list.append(sp.re(r))
+    if isinstance(mylist, np.ndarray):
+        return values.real[real]
 
-    return new_list
+    return [sp.re(r) for r, is_real in zip(mylist, real) if is_real]
+
+
+def real_roots(coeffs):
+    """
+    real roots of a polynomial, given by its coefficients (highest
+    degree first), as sorted numpy array
+    """
+
+    return np.sort(remove_complex(np.roots(coeffs)))
 
 
 """
@@ -100,19 +125,17 @@ input list of numbers in sympy form, output the max and min value of it.
 
 
 def max_sp_list(mylist):
-    if not list:
+    if len(mylist) == 0:
         return 0
     else:
-        mylist = [r.evalf() for r in mylist]
-        return round(max(mylist), 3)
+        return round(float(np.max(np.asarray(mylist, dtype=float))), 3)
 
 
 def min_sp_list(mylist):
-    if not mylist:
+    if len(mylist) == 0:
         return 0
     else:
-        mylist = [r.evalf() for r in mylist]
-        return round(min(mylist), 3)
+        return round(float(np.min(np.asarray(mylist, dtype=float))), 3)
 
 
 """
@@ -0,0 +1,178 @@
+import builtins
+import inspect
+import os
+import tempfile
+
+import numpy as np
+import sympy as sp
+
+from .math_cache import BoundedCache, expression_key
+
+# Numeric backends for compiled functions:
+#   "math": evaluate with Python's math module (fast for single floats)
+#   "numpy": evaluate with numpy (accepts arrays)
+#   "sympy": evaluate with sympy (exact results, slow)
+BACKENDS = {
+    "math": ["math"],
+    "numpy": ["numpy"],
+    "sympy": "sympy",
+}
+
+# Cache of compiled functions, keyed by (expression, variables, backend).
+# Sympy expressions compare structurally and cache their hash, so the same
+# expression used across many problem variants is compiled only once.
+LAMBDA_CACHE = BoundedCache(maxsize=4096, policy="lru")
+
+# Settings of the (opt-in) on-disk cache of generated code,
+# see enable_code_cache
+CODE_CACHE = {"dir": None}
+
+# Namespaces of the backends (as set up by lambdify)
+_NAMESPACES = {}
+
+
+def enable_code_cache(path=None):
+    """
+    Store the source code generated by lambdify on disk, so that later
+    sessions can load compiled functions without running sympy's code
+    generation again.
+
+    Code is stored in a subdirectory of path (default:
+    ~/.cache/cyllene/lambdify) named after the sympy version, so that
+    code generated by a different sympy version is never loaded.
+    The cached files are executed when loaded, so path should only be
+    writable by the user.
+    """
+
+    if path is None:
+        path = os.path.join(os.path.expanduser("~"), ".cache", "cyllene", "lambdify")
+
+    path = os.path.join(path, "sympy-" + sp.__version__)
+    os.makedirs(path, exist_ok=True)
+    CODE_CACHE["dir"] = path
+
+
+def disable_code_cache():
+    """ stop using the on-disk code cache """
+
+    CODE_CACHE["dir"] = None
+
+
+def backend_namespace(backend):
+    """
+    the namespace lambdify sets up for a backend, used to execute
+    generated code loaded from disk
+    """
+
+    if backend not in _NAMESPACES:
+        _NAMESPACES[backend] = sp.lambdify(
+            [], 0, modules=BACKENDS[backend]).__globals__
+
+    return _NAMESPACES[backend]
+
+
+def load_code(key, backend):
+    """
+    load a compiled function from the on-disk code cache
+    (None if not present or not loadable)
+    """
+
+    path = os.path.join(CODE_CACHE["dir"], key + ".py")
+
+    try:
+        with open(path) as f:
+            source = f.read()
+        namespace = dict(backend_namespace(backend))
+        exec(compile(source, path, "exec"), namespace)
+        lambda_form = namespace["_lambdifygenerated"]
+    except Exception:
+        return None
+
+    # make sure all names used by the code are available
+    for name in lambda_form.__code__.co_names:
+        if name not in namespace and not hasattr(builtins, name):
+            return None
+
+    return lambda_form
+
+
+def store_code(key, lambda_form):
+    """ write the source of a function generated by lambdify to the code cache """
+
+    try:
+        source = inspect.getsource(lambda_form)
+    except (OSError, TypeError):
+        return
+
+    # write to a temporary file first, so that other processes never
+    # see a partially written file
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=CODE_CACHE["dir"], suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            f.write(source)
+        os.replace(tmp_path, os.path.join(CODE_CACHE["dir"], key + ".py"))
+    except OSError:
+        pass
+
+
+def broadcasting(lambda_form):
+    """
+    wrap a function generated for the numpy backend, so that it accepts
+    any array-like arguments (such as lists) and always returns an array
+    of the shape of its (broadcast) arguments, also for constant
+    expressions
+    """
+
+    def evaluate(*args):
+        args = [np.asarray(arg) for arg in args]
+        shape = np.broadcast_shapes(*[arg.shape for arg in args])
+        values = lambda_form(*args)
+        if np.shape(values) != shape:
+            # copy, as broadcast_to returns a read-only view
+            values = np.array(np.broadcast_to(values, shape))
+        return values
+
+    return evaluate
+
+
+def compile_function(expr, variables, backend="sympy"):
+    """
+    turn a sympy expression into a Python function, using sp.lambdify
+    with the given backend ("math", "numpy", or "sympy")
+
+    variables can be a single sympy symbol or a list of symbols.
+    Functions for the numpy backend accept array-likes and return arrays
+    of the shape of their arguments (see broadcasting).
+    Compiled functions are cached in LAMBDA_CACHE and, if enabled,
+    on disk (see enable_code_cache). They carry the expression and the
+    variables they were compiled from as attributes expr and variables.
+    """
+
+    if backend not in BACKENDS:
+        raise ValueError(str(backend) + " is not a valid backend")
+
+    if isinstance(variables, list):
+        variables = tuple(variables)
+
+    key = (expr, variables, backend)
+    lambda_form = LAMBDA_CACHE.get(key)
+    if lambda_form is not None:
+        return lambda_form
+
+    if CODE_CACHE["dir"] is not None:
+        code_key = expression_key(expr, variables, backend)
+        lambda_form = load_code(code_key, backend)
+        if lambda_form is None:
+            lambda_form = sp.lambdify(variables, expr, modules=BACKENDS[backend])
+            store_code(code_key, lambda_form)
+    else:
+        lambda_form = sp.lambdify(variables, expr, modules=BACKENDS[backend])
+
+    if backend == "numpy":
+        lambda_form = broadcasting(lambda_form)
+
+    lambda_form.expr = expr
+    lambda_form.variables = variables
+    LAMBDA_CACHE.put(key, lambda_form)
+
+    return lambda_form
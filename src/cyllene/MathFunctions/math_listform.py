@@ -1,3 +1,11 @@
+from bisect import bisect_left
+
+import sympy as sp
+from sympy.core.mul import _keep_coeff
+
+from .math_helpers import MYLOCALS
+from .math_string import is_number
+
 # want to edit this so that nested functions get expanded out if possible
 
 #  Operators
@@ -10,6 +18,23 @@ unary_operators = ['const', 'step', 'exp', 'trig', 'poly', 'linear',
 unary_operators_with_parameters = ['log']
 binary_operators = ['+', '-', '*', '/', '^']
 
+# Names of sympy functions in list form (other functions keep their name)
+LIST_FUNCTIONS = {'Abs': 'abs', 'asin': 'arcsin', 'acos': 'arccos',
+                  'atan': 'arctan', 'asec': 'arcsec', 'acsc': 'arccsc',
+                  'acot': 'arccot'}
+
+# Sympy functions of the functions in list form
+SYMPY_FUNCTIONS = {'exp': sp.exp, 'log': sp.log, 'ln': sp.log,
+                   'sqrt': sp.sqrt, 'cbrt': sp.cbrt, 'abs': sp.Abs,
+                   'sin': sp.sin, 'cos': sp.cos, 'tan': sp.tan,
+                   'sec': sp.sec, 'csc': sp.csc, 'cot': sp.cot,
+                   'arcsin': sp.asin, 'arccos': sp.acos, 'arctan': sp.atan,
+                   'arcsec': sp.asec, 'arccsc': sp.acsc, 'arccot': sp.acot}
+
+# Constants in list form
+SYMPY_CONSTANTS = {'pi': sp.pi, 'E': sp.E, 'e': sp.E, 'I': sp.I,
+                   'oo': sp.oo, 'zoo': sp.zoo, 'nan': sp.nan}
+
 
 def list_to_string(list_form):
     if type(list_form) is not list:
@@ -30,6 +55,57 @@ def list_to_string(list_form):
             + list_to_string(list_form[2]) + ')'
 
 
+class OperatorIndex:
+    """
+    Positions of operators and commas in a string, grouped by
+    parentheses level, to find the top-level operators of any
+    substring by bisection.
+
+    Attributes:
+    -----------
+    levels : list
+        levels[i] is the parentheses level of string[i]
+        (open minus close parentheses in string[:i])
+    positions : dict
+        for each operator, a dictionary mapping levels to the
+        (increasing) list of positions of the operator at that level
+    """
+
+    def __init__(self, string):
+
+        self.levels = []
+        self.positions = {op: {} for op in binary_operators + [',']}
+
+        nest_level = 0
+        for i, c in enumerate(string):
+            self.levels.append(nest_level)
+            if c == '(':
+                nest_level += 1
+            elif c == ')':
+                nest_level -= 1
+            elif c in self.positions:
+                # a '-' following '*', '/', '^' is a negative sign
+                if c == '-' and i > 0 and string[i - 1] in ['*', '/', '^']:
+                    continue
+                self.positions[c].setdefault(nest_level, []).append(i)
+
+    def first(self, op, level, start, end):
+        # first position of op at the given level in [start, end), or -1
+        positions = self.positions[op].get(level, [])
+        k = bisect_left(positions, start)
+        if k < len(positions) and positions[k] < end:
+            return positions[k]
+        return -1
+
+    def last(self, op, level, start, end):
+        # last position of op at the given level in [start, end), or -1
+        positions = self.positions[op].get(level, [])
+        k = bisect_left(positions, end) - 1
+        if k >= 0 and positions[k] >= start:
+            return positions[k]
+        return -1
+
+
 def string_to_list(string):
     '''
     Transforms an input string properly formatted as a
@@ -41,11 +117,14 @@ def string_to_list(string):
     which are either variables (in the form of strings), numbers,
     or other lists, representing composed functions.
 
-    By the nature of function composition, this function is recursive.
     It uses order of operations to identify the
     top level function, breaks the function into the operand(s)
-    of that function, and then calls itself on that (those)
-    operand(s).
+    of that function, and then processes those operand(s) the
+    same way. Operands are processed from a stack (not by recursion),
+    so deeply nested expressions cannot exceed the recursion limit.
+    Top-level operators of an operand are looked up in an index of
+    operator positions by parentheses level (see OperatorIndex), so
+    each step takes logarithmic rather than linear time.
 
     IMPORTANT: this function assumes that the input has already been
     validated by check_format.
@@ -58,105 +137,94 @@ def string_to_list(string):
             ['+','x',['*',3,['sin',['^','x',2]]]]
     '''
 
-    """
-    if the function leads with a '-' character, the leading operator
-    in the expression may be the negation operator.
-    """
-    if string[0] == '-':
-        neg = True
-    else:
-        neg = False
+    index = OperatorIndex(string)
 
-    """
-    step through the string recoding positions of all binary operators
-    not inside parentheses.
-    """
-    nest_level = 0
-    plus = []
-    minus = []
-    times = []
-    divide = []
-    power = []
-    for i in range(len(string)):
-        if string[i] == '(':
-            nest_level += 1
-        if string[i] == ')':
-            nest_level -= 1
-        if string[i] == '+' and nest_level == 0:
-            plus += [i]
-        if string[i] == '-' and nest_level == 0 and \
-                (i == 0 or (i > 0 and string[i - 1] not in ['*', '/', '^'])):
-            minus += [i]
-        if string[i] == '*' and nest_level == 0:
-            times += [i]
-        if string[i] == '/' and nest_level == 0:
-            divide += [i]
-        if string[i] == '^' and nest_level == 0:
-            power += [i]
+    # the stack holds substrings string[start:end] still to be
+    # transformed, and where to put the result (parent[slot])
+    root = [None]
+    stack = [(0, len(string), root, 0)]
+
+    while stack:
+        start, end, parent, slot = stack.pop()
+
+        if start >= end:
+            raise IndexError('empty operand')
+
+        level = index.levels[start]
 
-    """
-    use order of operations to determine which binary operator
-    is the top-level operator, if any.
-    """
-    if len(plus) > 0:
-        pos = plus[0]
-    elif len(minus) > 0 and not neg:
-        pos = minus[-1]
-    elif len(minus) > 1 and neg:
-        pos = minus[-1]
-    elif len(times) > 0:
-        pos = times[0]
-    elif len(divide) > 0:
-        pos = divide[0]
-    elif len(power) > 0:
-        pos = power[0]
-    else:
-        pos = -1
-    if pos > -1:
         """
-        if the top-level operator is a binary operator return
-        a 3-element list whose first element
-        is the binary operator, and the next two elements are
-        the operands, in order. Note the
-        recursive use of the function on the two operands.
+        if the function leads with a '-' character, the leading operator
+        in the expression may be the negation operator.
         """
-        return [string[pos],
-                string_to_list(string[:pos]),
-                string_to_list(string[pos + 1:])]
+        neg = string[start] == '-'
 
-    """
-    if the entire expression is contained in parentheses,
-    evaluate this function only on what is inside the parentheses.
-    """
-    if string[0] == '(' and string[-1] == ')':
-        return string_to_list(string[1:-1])
+        """
+        use order of operations to determine which binary operator
+        (not inside parentheses) is the top-level operator, if any.
+        """
+        pos = index.first('+', level, start, end)
+        if pos == -1:
+            pos = index.last('-', level, start + 1 if neg else start, end)
+        for op in ['*', '/', '^']:
+            if pos == -1:
+                pos = index.first(op, level, start, end)
 
-    """
-    if the expression leads with '-', the negation operator is
-    the top-level operator.
-    """
-    if neg:
-        return ['neg', string_to_list(string[1:])]
+        if pos > -1:
+            """
+            if the top-level operator is a binary operator, the result
+            is a 3-element list whose first element is the binary
+            operator, and the next two elements are the operands, in order.
+            """
+            node = [string[pos], None, None]
+            parent[slot] = node
+            stack.append((pos + 1, end, node, 2))
+            stack.append((start, pos, node, 1))
+            continue
 
-    """
-    if the expression leads with a unary operator,
-    it is the top-level operator.
-    """
-    for func in unary_operators:
-        if string.startswith(func):
-            if func == 'log':
-                comma_index = [i for i in range(len(string))
-                               if (string[i] == ',' and get_parentheses_level(string, i) == 1)]
-                if len(comma_index) > 0:
-                    i = comma_index[0]
-                    return ['log', get_context(string, i - 1), get_context(string, i + 1)]
-            return [func, string_to_list(string[len(func):])]
+        """
+        if the entire expression is contained in parentheses,
+        continue only with what is inside the parentheses.
+        """
+        if string[start] == '(' and string[end - 1] == ')':
+            stack.append((start + 1, end - 1, parent, slot))
+            continue
 
-    """
-    the only other possibility is that input is an atomic expression
-    -- either a variable or a number.
-    """
-    return string
+        """
+        if the expression leads with '-', the negation operator is
+        the top-level operator.
+        """
+        if neg:
+            node = ['neg', None]
+            parent[slot] = node
+            stack.append((start + 1, end, node, 1))
+            continue
+
+        """
+        if the expression leads with a unary operator,
+        it is the top-level operator.
+        """
+        for func in unary_operators:
+            if string.startswith(func, start, end):
+                if func == 'log':
+                    i = index.first(',', level + 1, start, end)
+                    if i > -1:
+                        substring = string[start:end]
+                        parent[slot] = ['log',
+                                        get_context(substring, i - start - 1),
+                                        get_context(substring, i - start + 1)]
+                        break
+                node = [func, None]
+                parent[slot] = node
+                stack.append((start + len(func), end, node, 1))
+                break
+        else:
+            """
+            the only other possibility is that input is an atomic expression
+            -- either a variable or a number.
+            """
+            parent[slot] = string[start:end]
+
+    return root[0]
 
 
 def get_context(string, i):
@@ -175,3 +243,245 @@ def get_parentheses_level(string, i):
     # does not count string[i], enven if it is a parenthesis.
 
     return string[:i].count('(') - string[:i].count(')')
+
+
+def sympy_to_list(expr):
+    '''
+    Transforms a sympy expression into list form by walking its
+    expression tree, without printing and reparsing it.
+
+    The list form is the one string_to_list gives for the printed
+    expression (str(expr) with '**' replaced by '^'): the terms and
+    factors come in the order sympy prints them and are nested like
+    string_to_list nests them (a sum is split at its first '+', then at
+    its last '-'; a product at its first '*', then at '/'), and a
+    leading minus sign stays with the first factor, e.g. -2*x gives
+    ['*', ['neg', '2'], 'x'].
+    Unlike in string_to_list, atoms carry no spaces, floats are written
+    so that list_to_sympy restores them exactly, sympy functions get the
+    names of unary_operators (asin -> arcsin, Abs -> abs), and a minus
+    sign in front of a power negates the power (string_to_list reads
+    -x^2 as ['^', ['neg', 'x'], '2']).
+
+    Example:
+        sympy_to_list(x**2 - 3*sin(x)/2) returns
+            ['-', ['^', 'x', '2'], ['*', '3', ['/', ['sin', 'x'], '2']]]
+    '''
+
+    if expr.is_Symbol:
+        return expr.name
+
+    if expr.is_Number:
+        if expr.is_extended_negative:
+            if expr.is_Rational and not expr.is_Integer:
+                # -p/q is split at '/'
+                return ['/', ['neg', str(-expr.p)], str(expr.q)]
+            return ['neg', sympy_to_list(-expr)]
+        if expr.is_Integer:
+            return str(expr)
+        if expr.is_Rational:
+            return ['/', str(expr.p), str(expr.q)]
+        if expr.is_Float:
+            return repr(float(expr))
+        return str(expr)
+
+    if expr.is_Add:
+        return sum_list(expr)
+
+    if expr.is_Mul:
+        return product_list(*product_parts(expr))
+
+    if expr.is_Pow:
+        if expr.exp is sp.S.Half:
+            return ['sqrt', sympy_to_list(expr.base)]
+        if -expr.exp is sp.S.Half:
+            return ['/', '1', ['sqrt', sympy_to_list(expr.base)]]
+        if expr.exp is sp.S.NegativeOne:
+            return ['/', '1', sympy_to_list(expr.base)]
+        return ['^', sympy_to_list(expr.base), sympy_to_list(expr.exp)]
+
+    if isinstance(expr, sp.exp):
+        return ['exp', sympy_to_list(expr.args[0])]
+
+    if isinstance(expr, sp.Function) and len(expr.args) == 1:
+        name = LIST_FUNCTIONS.get(type(expr).__name__, type(expr).__name__)
+        return [name, sympy_to_list(expr.args[0])]
+
+    # constants (pi, E, ...) and anything list form has no operator for
+    return str(expr)
+
+
+def signed_list(expr):
+    # (whether expr is printed with a leading minus sign,
+    #  list form of the printed expression without that sign)
+    if expr.is_Number and expr.is_extended_negative:
+        return True, sympy_to_list(-expr)
+    if expr.is_Mul:
+        sign, numerator, denominator = product_parts(expr)
+        return sign, product_list(False, numerator, denominator)
+    return False, sympy_to_list(expr)
+
+
+def sum_list(expr):
+    # list form of a sum, split like string_to_list splits the printed sum:
+    # at '+' signs (nested from the right), and the groups of terms in
+    # between at '-' signs (nested from the left)
+    groups = []
+    for index, term in enumerate(expr.as_ordered_terms()):
+        negative, list_form = (False, sympy_to_list(term)) if term.is_Add \
+            else signed_list(term)
+        if index == 0:
+            groups.append(sympy_to_list(term) if negative else list_form)
+        elif negative:
+            groups[-1] = ['-', groups[-1], list_form]
+        else:
+            groups.append(list_form)
+
+    list_form = groups[-1]
+    for group in reversed(groups[:-1]):
+        list_form = ['+', group, list_form]
+    return list_form
+
+
+def product_parts(expr):
+    # (leading minus sign, numerator factors, denominator factors) of a
+    # product as sympy prints it, with the factors in list form
+    args = expr.args
+    if args[0] is sp.S.One or any(
+            isinstance(a, sp.Number) or
+            a.is_Pow and all(_.is_Integer for _ in a.args) for a in args[1:]):
+        # unevaluated product: sympy prints all factors in their order
+        numerator = []
+        denominator = []
+        for factor in args:
+            if factor.is_Pow and factor.exp.as_coeff_Mul()[0] < 0:
+                exp = -factor.exp
+                denominator.append(sympy_to_list(
+                    factor.base if exp == 1
+                    else sp.Pow(factor.base, exp, evaluate=False)))
+            else:
+                numerator.append(factor)
+
+        sign = False
+        if numerator and not numerator[0].is_Add:
+            sign, first = signed_list(numerator[0])
+            numerator = [first] + [sympy_to_list(_) for _ in numerator[1:]]
+        else:
+            numerator = [sympy_to_list(_) for _ in numerator]
+
+        return sign, numerator or ['1'], denominator
+
+    coeff, rest = expr.as_coeff_Mul()
+    sign = bool(coeff < 0)
+    if sign:
+        expr = _keep_coeff(-coeff, rest)
+
+    numerator = []
+    denominator = []
+    for factor in expr.as_ordered_factors():
+        if factor.is_Pow and factor.exp.as_coeff_Mul()[0] < 0:
+            denominator.append(sympy_to_list(
+                factor.base if factor.exp is sp.S.NegativeOne
+                else sp.Pow(factor.base, -factor.exp, evaluate=False)))
+        elif factor.is_Rational:
+            if factor.p != 1:
+                numerator.append(str(factor.p))
+            if factor.q != 1:
+                denominator.append(str(factor.q))
+        else:
+            numerator.append(sympy_to_list(factor))
+
+    return sign, numerator or ['1'], denominator
+
+
+def product_list(sign, numerator, denominator):
+    # list form of a printed product: split at the first '*' of the
+    # numerator, then at '/' (a leading minus sign negates the first factor)
+    factors = list(numerator)
+    if sign:
+        factors[0] = ['neg', factors[0]]
+
+    list_form = factors[-1]
+    if denominator:
+        list_form = ['/', list_form, denominator[0] if len(denominator) == 1
+                     else product_list(False, denominator, [])]
+    for factor in reversed(factors[:-1]):
+        list_form = ['*', factor, list_form]
+    return list_form
+
+
+def list_to_sympy(list_form, mylocals=None, evaluate=True):
+    '''
+    Transforms a list form into a sympy expression by walking the
+    nested lists, without printing and parsing a string.
+
+    Variables are looked up in mylocals (default: the reserved real
+    symbols MYLOCALS), other names become real symbols. With
+    evaluate=False, sympy does not simplify the resulting expression.
+    Atoms that are neither numbers nor names (and constants like pi)
+    are parsed by sympy.
+    Raises ValueError for lists that are not a valid list form.
+    '''
+
+    if mylocals is None:
+        mylocals = MYLOCALS
+
+    if type(list_form) is not list:
+        atom = list_form.strip()
+        if atom in mylocals:
+            return mylocals[atom]
+        if atom in SYMPY_CONSTANTS:
+            return SYMPY_CONSTANTS[atom]
+        if atom.isdigit():
+            return sp.Integer(atom)
+        if is_number(atom):
+            return sp.Float(atom, precision=53)
+        if atom.isidentifier():
+            return sp.Symbol(atom, real=True)
+        return sp.sympify(atom, locals=mylocals)
+
+    if list_form[0] in ['*', '/', 'neg']:
+        # build products in one step, as sympy distributes a number over
+        # a sum when multiplying just the two
+        return sp.Mul(*product_factors(list_form, mylocals, evaluate),
+                      evaluate=evaluate)
+
+    operands = [list_to_sympy(_, mylocals, evaluate) for _ in list_form[1:]]
+
+    if len(list_form) == 2:
+        if list_form[0] in SYMPY_FUNCTIONS:
+            return SYMPY_FUNCTIONS[list_form[0]](operands[0], evaluate=evaluate)
+        return sp.Function(list_form[0])(operands[0])
+
+    if len(list_form) == 3:
+        a, b = operands
+        if list_form[0] == '+':
+            return sp.Add(a, b, evaluate=evaluate)
+        if list_form[0] == '-':
+            return sp.Add(a, sp.Mul(-1, b, evaluate=evaluate), evaluate=evaluate)
+        if list_form[0] == '^':
+            return sp.Pow(a, b, evaluate=evaluate)
+        if list_form[0] == 'log':
+            return sp.log(a, b, evaluate=evaluate)
+
+    raise ValueError('Invalid list form')
+
+
+def product_factors(list_form, mylocals, evaluate):
+    # sympy factors of a chain of products, quotients and negations
+    # in list form (divisors are raised to the power -1)
+    factors = []
+    stack = [(list_form, False)]
+    while stack:
+        node, inverse = stack.pop()
+        if type(node) is list and node[0] in ['*', '/']:
+            stack.append((node[2], inverse != (node[0] == '/')))
+            stack.append((node[1], inverse))
+        elif type(node) is list and node[0] == 'neg':
+            factors.append(sp.S.NegativeOne)
+            stack.append((node[1], inverse))
+        else:
+            factor = list_to_sympy(node, mylocals, evaluate)
+            factors.append(sp.Pow(factor, -1, evaluate=evaluate)
+                           if inverse else factor)
+    return factors
@@ -0,0 +1,139 @@
+import weakref
+
+from .math_string import is_number
+
+
+class VariableSet(frozenset):
+    # variable set of nodes, a distinct object from the plain frozenset
+    # used as its key in VARIABLE_SETS (frozensets can be referenced
+    # weakly, but frozenset(s) returns s itself)
+    __slots__ = ()
+
+
+# Variable sets of the nodes alive (most list forms have the same few
+# variables, so nodes share the sets instead of holding copies)
+VARIABLE_SETS = weakref.WeakValueDictionary()
+
+
+class ListNode:
+    """
+    Immutable node of a list form (as given by string_to_list), for
+    holding many list forms at once.
+
+    Nodes are hash-consed: building a node with the same operator and
+    operands as an existing node returns the existing node, so identical
+    subtrees (within a list form and across list forms) are stored only
+    once, and two list forms are equal exactly if their nodes are the
+    same object. Operands are nodes or atoms (strings). Each node stores
+    the set of variables of its subtree, so looking up the variables of
+    a list form takes constant time.
+
+    Attributes:
+    -----------
+    op : str
+        operator or function ('+', 'sin', 'neg', ...)
+    args : tuple
+        operands (ListNode or str)
+    variables : frozenset
+        names of the variables in the subtree
+    """
+
+    __slots__ = ('op', 'args', 'variables', '__weakref__')
+
+    # all nodes currently alive, keyed by (op, args)
+    _nodes = weakref.WeakValueDictionary()
+
+    def __new__(cls, op, *args):
+
+        key = (op, args)
+        node = cls._nodes.get(key)
+        if node is not None:
+            return node
+
+        node = object.__new__(cls)
+        object.__setattr__(node, 'op', op)
+        object.__setattr__(node, 'args', args)
+        variables = frozenset().union(*[atom_variables(_) for _ in args])
+        shared = VARIABLE_SETS.get(variables)
+        if shared is None:
+            # the key is a plain copy, so that it does not keep the
+            # shared set alive
+            shared = VariableSet(variables)
+            VARIABLE_SETS[variables] = shared
+        object.__setattr__(node, 'variables', shared)
+        cls._nodes[key] = node
+
+        return node
+
+    def __setattr__(self, name, value):
+        raise AttributeError('ListNode is immutable')
+
+    def __delattr__(self, name):
+        raise AttributeError('ListNode is immutable')
+
+    def __reduce__(self):
+        # rebuild (and hash-cons) the node when unpickled
+        return (ListNode, (self.op,) + self.args)
+
+    def __repr__(self):
+        return 'ListNode' + repr((self.op,) + self.args)
+
+    @classmethod
+    def from_list(cls, list_form):
+        """
+        Build the node of a list form (atoms are returned as they are).
+
+        Walks the list form with a stack, so deeply nested list forms
+        cannot exceed the recursion limit.
+        """
+
+        if type(list_form) is not list:
+            return list_form
+
+        # visit each list twice: first push its operands, then build it
+        # from the nodes of its operands
+        nodes = []
+        stack = [(list_form, False)]
+        while stack:
+            item, ready = stack.pop()
+            if ready:
+                n = len(item) - 1
+                args = nodes[len(nodes) - n:]
+                del nodes[len(nodes) - n:]
+                nodes.append(cls(item[0], *args))
+            elif type(item) is list:
+                stack.append((item, True))
+                stack.extend((_, False) for _ in reversed(item[1:]))
+            else:
+                nodes.append(item)
+
+        return nodes[0]
+
+    def to_list(self):
+        """ the list form of the node, as nested lists """
+
+        lists = []
+        stack = [(self, False)]
+        while stack:
+            item, ready = stack.pop()
+            if ready:
+                n = len(item.args)
+                args = lists[len(lists) - n:]
+                del lists[len(lists) - n:]
+                lists.append([item.op] + args)
+            elif isinstance(item, ListNode):
+                stack.append((item, True))
+                stack.extend((_, False) for _ in reversed(item.args))
+            else:
+                lists.append(item)
+
+        return lists[0]
+
+
+def atom_variables(atom):
+    # variables of an operand of a node (node or atom)
+    if isinstance(atom, ListNode):
+        return atom.variables
+    if is_number(atom):
+        return frozenset()
+    return frozenset([atom])
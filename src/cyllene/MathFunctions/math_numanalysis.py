@@ -0,0 +1,160 @@
+import numpy as np
+import sympy as sp
+
+from .math_compare import evaluate_lambda, lambdify_numpy
+from .math_helpers import real_roots
+
+# Parameters of the numerical analysis of functions
+NUMERIC_RANGE = (-10, 10)
+NUMERIC_SAMPLES = 4001
+BISECTION_STEPS = 60
+ZERO_TOL = 1e-9
+ROOT_DIGITS = 12
+
+
+def bracket_roots(lambda_func, grid, values):
+    """
+    find the roots of a function (evaluated on a grid) where it changes
+    sign, refined with a vectorized bisection
+
+    All brackets are refined at once, in a fixed number of steps
+    (BISECTION_STEPS), so the cost does not depend on the function.
+    Brackets around poles (where the function grows instead of
+    approaching 0) are dropped. Returns a numpy array of roots.
+    """
+
+    # grid points where the function vanishes
+    roots = [grid[values == 0]]
+
+    with np.errstate(invalid="ignore"):
+        change = values[:-1] * values[1:] < 0
+    if np.any(change):
+        a, b = grid[:-1][change], grid[1:][change]
+        value_a = values[:-1][change]
+        bound = np.maximum(np.abs(value_a), np.abs(values[1:][change]))
+
+        for _ in range(BISECTION_STEPS):
+            m = (a + b) / 2
+            value_m = evaluate_lambda(lambda_func, [m])
+            # keep the half with the sign change (nan stays left)
+            left = ~(value_m * value_a > 0)
+            b = np.where(left, m, b)
+            a = np.where(left, a, m)
+            value_a = np.where(left, value_a, value_m)
+
+        m = (a + b) / 2
+        value_m = evaluate_lambda(lambda_func, [m])
+        roots.append(m[np.abs(value_m) <= bound])
+
+    return np.concatenate(roots)
+
+
+def squarefree_roots(poly):
+    # real roots of a sympy Poly, computed from its square-free part
+    # (so that np.roots only has to find simple roots)
+    coeffs = np.array(poly.sqf_part().all_coeffs(), dtype=float)
+    return real_roots(coeffs)
+
+
+def rational_roots(sym_form, variable):
+    """
+    real roots of a rational function (in particular, of a polynomial),
+    found with np.roots on the coefficients of numerator and denominator
+
+    Roots of the numerator where the denominator vanishes as well are
+    not in the domain and are dropped. Returns a sorted numpy array, or
+    None if the coefficients are not numbers or the function vanishes
+    identically.
+    """
+
+    try:
+        numerator, denominator = [
+            sp.Poly(_, variable) for _ in sp.fraction(sp.together(sym_form))]
+        if numerator.is_zero:
+            return None
+        roots = squarefree_roots(numerator)
+        poles = squarefree_roots(denominator)
+    except Exception:
+        # coefficients are not numbers
+        return None
+
+    if len(roots) and len(poles):
+        roots = roots[~np.any(np.isclose(roots[:, None], poles[None, :],
+                                         rtol=1e-9, atol=ZERO_TOL), axis=1)]
+
+    return np.unique(np.round(roots, ROOT_DIGITS))
+
+
+def numeric_roots(sym_form, variable, interval=NUMERIC_RANGE, num_samples=NUMERIC_SAMPLES):
+    """
+    roots of a sympy expression in an interval, found numerically
+
+    Roots of rational functions are computed directly (on the whole real
+    line) by rational_roots. Otherwise, sign changes are bracketed on an
+    evenly spaced grid and refined by bisection. Roots where the
+    expression only touches 0 (like x**2) are found as critical points
+    with value 0.
+    Returns a sorted numpy array (None if the expression cannot be
+    evaluated numerically or vanishes on the whole grid).
+    """
+
+    if sym_form.is_rational_function(variable):
+        return rational_roots(sym_form, variable)
+
+    lambda_func = lambdify_numpy(sym_form, variable)
+    grid = np.linspace(interval[0], interval[1], num_samples)
+    values = evaluate_lambda(lambda_func, [grid])
+    if values is None or np.all(values == 0):
+        # not evaluable, or roots are not isolated
+        return None
+
+    roots = bracket_roots(lambda_func, grid, values)
+
+    # roots without sign change are extrema of the function
+    diff = sp.diff(sym_form, variable)
+    if diff != 0:
+        diff_func = lambdify_numpy(diff, variable)
+        diff_values = evaluate_lambda(diff_func, [grid])
+        if diff_values is not None:
+            extrema = bracket_roots(diff_func, grid, diff_values)
+            extrema_values = evaluate_lambda(lambda_func, [extrema])
+            roots = np.concatenate(
+                [roots, extrema[np.abs(extrema_values) <= ZERO_TOL]])
+
+    return np.unique(np.round(roots, ROOT_DIGITS))
+
+
+def numeric_zeros(sym_form, variable):
+    return numeric_roots(sym_form, variable)
+
+
+def numeric_critical_points(sym_form, variable):
+    return numeric_roots(sp.diff(sym_form, variable), variable)
+
+
+def numeric_inflection_points(sym_form, variable):
+    return numeric_roots(sp.diff(sym_form, variable, 2), variable)
+
+
+NUMERIC_ANALYSIS = {
+    "zeros": numeric_zeros,
+    "critical_points": numeric_critical_points,
+    "inflection_points": numeric_inflection_points,
+}
+
+
+def numeric_analysis(sym_form, variable, name):
+    """
+    compute an analysis property (zeros, critical_points, or
+    inflection_points) of an expression numerically, in NUMERIC_RANGE
+    (on the whole real line for rational functions)
+
+    Returns a sympy FiniteSet of floats, or None if the expression
+    cannot be evaluated numerically.
+    """
+
+    roots = NUMERIC_ANALYSIS[name](sym_form, variable)
+    if roots is None:
+        return None
+
+    return sp.FiniteSet(*[sp.Float(_) for _ in roots])
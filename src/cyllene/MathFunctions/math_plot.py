@@ -1,11 +1,69 @@
-import matplotlib.pyplot as plt
+import io
+
+import numpy as np
 import sympy as sp
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
 
+from .math_compare import evaluate_lambda
+from .math_lambdify import compile_function
 from .math_rfunction import RFunction
 
+# Parameters of the adaptive sampling of graphs
+PLOT_SAMPLES = 200
+PLOT_DEPTH = 10
+MAX_SAMPLES = 20000
+MAX_POINTS = 2000
+BEND_TOL = 0.05
+JUMP_TOL = 0.5
+STEEP_TOL = 1000
+
+# x-range of graphs without relevant points, and least distance between
+# the relevant points and the ends of the x-range
+GENERIC_XRANGE = (-6, 6)
+MIN_XRANGE_PADDING = 3
+
+# Default style of rendered graphs
+PLOT_STYLE = {
+    "figsize": (4, 3),
+    "dpi": 100,
+    "color": "C0",
+    "linewidth": 1.5,
+    "grid": True,
+}
+
+# Image metadata (no creation dates, so that identical graphs give
+# identical files)
+IMAGE_METADATA = {
+    "png": {"Software": None},
+    "svg": {"Date": None},
+}
+
+
+def padded_xrange(inf, sup):
+    # x-range around the relevant points from inf to sup
+    inf, sup = float(inf), float(sup)
+    delta = max(sup - inf, MIN_XRANGE_PADDING)
+    return inf - delta, sup + delta
+
 
 def determine_xrange(func: RFunction):
 
+    if func.status == "finite":
+        # function given by table: the whole (finite) domain is relevant
+        if len(func.domain) == 0:
+            return GENERIC_XRANGE
+        return padded_xrange(float(func.domain[0]), float(func.domain[-1]))
+
+    # periodic functions have infinitely many relevant points (which
+    # take long to find), show at least one period on either side
+    try:
+        period = sp.periodicity(func.sym_form, func.variable)
+    except NotImplementedError:
+        period = None
+    if period is not None and period.is_positive:
+        width = max(float(period), GENERIC_XRANGE[1])
+        return -width, width
 
     relevant_pts = sp.EmptySet
 
@@ -17,26 +75,266 @@ def determine_xrange(func: RFunction):
         # do nothing
         pass
 
-    # add zeros
-    relevant_pts += func.zeros
-
-    # add critical points
-    relevant_pts += func.critical_points
-
-    # add potential inflection points
-    relevant_pts += func.inflection_points
+    # add zeros, critical points, and potential inflection points
+    # (if sympy can find and combine them)
+    for name in ["zeros", "critical_points", "inflection_points"]:
+        try:
+            relevant_pts += func.get_analysis(name)
+        except (NotImplementedError, ValueError):
+            # this is the case for floor, for example
+            # do nothing
+            pass
 
     if relevant_pts == sp.EmptySet:
         # no relevant points -> return generic interval
-        return -6,6
+        return GENERIC_XRANGE
 
     if not isinstance(relevant_pts, sp.sets.sets.FiniteSet):
         # infinitely many relevant pts
         # try intersection with compact interval
-        relevant_pts = sp.Intersection(relevant_pts, sp.Interval(-6,6))
+        relevant_pts = sp.Intersection(relevant_pts, sp.Interval(*GENERIC_XRANGE))
         if not isinstance(relevant_pts, sp.sets.sets.FiniteSet):
             # if this does not yield a finite set, resort to generic
-            return -6,6
- 
-    delta = relevant_pts.sup - relevant_pts.inf
-    return relevant_pts.inf - delta, relevant_pts.sup + delta
+            return GENERIC_XRANGE
+
+    return padded_xrange(relevant_pts.inf, relevant_pts.sup)
+
+
+def plot_evaluator(func: RFunction):
+    """
+    function evaluating func on a numpy array, with nan wherever func is
+    undefined or not real
+    """
+
+    lambda_form = compile_function(func.sym_form, func.variable, "numpy")
+
+    def evaluate(x):
+        values = evaluate_lambda(lambda_form, [x])
+        if values is None:
+            raise ValueError("function cannot be evaluated numerically")
+        return values
+
+    return evaluate
+
+
+def quantiles(x, y, q):
+    """
+    quantiles of the (defined) values of a sampled function, with each
+    sample weighted by the length of the x-interval it represents
+    (so that refined regions do not dominate)
+    """
+
+    weight = np.gradient(x) if len(x) > 1 else np.ones(len(x))
+    defined = ~np.isnan(y)
+    order = np.argsort(y[defined])
+    cumulative = np.cumsum(weight[defined][order])
+
+    return np.interp(np.asarray(q) * cumulative[-1], cumulative,
+                     y[defined][order])
+
+
+def curve_scale(x, y):
+    """
+    vertical scale of sampled values, ignoring the extreme values
+    near asymptotes
+    """
+
+    if np.all(np.isnan(y)):
+        return 1.0
+
+    low, high = quantiles(x, y, [0.05, 0.95])
+    return high - low if high > low else max(1.0, abs(high))
+
+
+def bend(x, y, xscale, yscale):
+    """
+    change of direction (in radians, in scaled coordinates) of the
+    polygon through the points (x, y) at each interior point
+    """
+
+    angle = np.arctan2(np.diff(y) / yscale, np.diff(x) / xscale)
+    with np.errstate(invalid="ignore"):
+        return np.abs(np.diff(angle))
+
+
+def refine_samples(evaluate, x, y, depth=PLOT_DEPTH):
+    """
+    adaptively refine samples of a function
+
+    Intervals next to points where the graph bends sharply, intervals
+    with large jumps, and intervals across the boundary of the domain
+    are halved, all at once, for up to depth rounds (or until there are
+    MAX_SAMPLES points).
+    """
+
+    xscale = x[-1] - x[0]
+    yscale = curve_scale(x, y)
+
+    for _ in range(depth):
+        defined = ~np.isnan(y)
+        sharp = bend(x, y, xscale, yscale) > BEND_TOL
+
+        refine = defined[:-1] != defined[1:]
+        refine[:-1] |= sharp
+        refine[1:] |= sharp
+        with np.errstate(invalid="ignore"):
+            refine |= np.abs(np.diff(y)) > JUMP_TOL * yscale
+
+        if not np.any(refine) or len(x) + np.count_nonzero(refine) > MAX_SAMPLES:
+            break
+
+        index = np.nonzero(refine)[0]
+        middle = (x[index] + x[index + 1]) / 2
+        x = np.insert(x, index + 1, middle)
+        y = np.insert(y, index + 1, evaluate(middle))
+
+    return x, y
+
+
+def break_asymptotes(evaluate, x, y):
+    """
+    insert nan between (refined) samples where the function jumps,
+    so that the graph is not connected across vertical asymptotes
+    or jump discontinuities
+
+    A large or steep jump is a discontinuity unless the value in the
+    middle of the interval lies strictly between the values at its ends
+    (as for steep but continuous graphs).
+    """
+
+    jump = np.abs(np.diff(y)) / curve_scale(x, y)
+    steep = STEEP_TOL * np.diff(x) / (x[-1] - x[0])
+    with np.errstate(invalid="ignore"):
+        index = np.nonzero(jump > np.minimum(JUMP_TOL, steep))[0]
+
+    middle = (x[index] + x[index + 1]) / 2
+    value = evaluate(middle)
+    low = np.minimum(y[index], y[index + 1])
+    high = np.maximum(y[index], y[index + 1])
+    with np.errstate(invalid="ignore"):
+        jump = ~((low < value) & (value < high))
+
+    index, middle = index[jump], middle[jump]
+    x = np.insert(x, index + 1, middle)
+    y = np.insert(y, index + 1, np.nan)
+
+    return x, y
+
+
+def decimate(x, y, max_points=MAX_POINTS):
+    """
+    reduce the number of samples to at most max_points (roughly),
+    keeping the end points, the points next to gaps, and the points
+    where the graph bends most
+    """
+
+    if len(x) <= max_points:
+        return x, y
+
+    defined = ~np.isnan(y)
+    keep = ~defined
+    keep[[0, -1]] = True
+    keep[:-1] |= ~defined[1:]
+    keep[1:] |= ~defined[:-1]
+
+    turn = np.nan_to_num(bend(x, y, x[-1] - x[0], curve_scale(x, y)))
+    budget = max_points - np.count_nonzero(keep)
+    if budget > 0:
+        keep[1 + np.argsort(turn)[len(turn) - budget:]] = True
+
+    return x[keep], y[keep]
+
+
+def sample_function(func: RFunction, xrange=None, num_samples=PLOT_SAMPLES):
+    """
+    sample a function for plotting
+
+    Starts from num_samples evenly spaced points in xrange (default:
+    determine_xrange), refines adaptively where the graph bends sharply
+    or leaves the domain, breaks the graph at vertical asymptotes, and
+    decimates the result to MAX_POINTS points.
+    Returns numpy arrays x, y (y is nan at gaps of the graph).
+    """
+
+    if xrange is None:
+        try:
+            xrange = determine_xrange(func)
+        except NotImplementedError:
+            # sympy cannot analyze the function
+            xrange = (-6, 6)
+    low, high = float(xrange[0]), float(xrange[1])
+    if high <= low:
+        low, high = low - 6, high + 6
+
+    if func.status == "finite":
+        x = func.domain[(func.domain >= low) & (func.domain <= high)]
+        return x, func.lambda_form(x)
+
+    evaluate = plot_evaluator(func)
+    x = np.linspace(low, high, num_samples)
+    x, y = refine_samples(evaluate, x, evaluate(x))
+    x, y = break_asymptotes(evaluate, x, y)
+
+    return decimate(x, y)
+
+
+def determine_yrange(x, y):
+    """
+    vertical range of a graph: all values, unless there are asymptotes,
+    in which case the extreme values are cut off
+    """
+
+    finite = y[~np.isnan(y)]
+    if len(finite) == 0:
+        return -6, 6
+
+    low, high = finite.min(), finite.max()
+    if high - low > 10 * curve_scale(x, y):
+        low, high = quantiles(x, y, [0.02, 0.98])
+
+    margin = 0.1 * (high - low) if high > low else 1.0
+    return low - margin, high + margin
+
+
+def plot_function(func: RFunction, xrange=None, **style):
+    """
+    draw the graph of a function as matplotlib Figure
+
+    The figure is rendered with the Agg backend (it does not change the
+    matplotlib backend in use, e.g. in a notebook). style can override
+    entries of PLOT_STYLE.
+    """
+
+    style = {**PLOT_STYLE, **style}
+
+    x, y = sample_function(func, xrange)
+
+    figure = Figure(figsize=style["figsize"], dpi=style["dpi"])
+    FigureCanvasAgg(figure)
+    axes = figure.add_subplot()
+
+    if func.status == "finite":
+        axes.plot(x, y, "o", color=style["color"])
+    else:
+        axes.plot(x, y, color=style["color"], linewidth=style["linewidth"])
+        axes.set_ylim(*determine_yrange(x, y))
+
+    if len(x):
+        axes.set_xlim(x[0], x[-1])
+    axes.grid(style["grid"])
+    axes.axhline(0, color="black", linewidth=0.8)
+    axes.axvline(0, color="black", linewidth=0.8)
+
+    return figure
+
+
+def plot_to_image(func: RFunction, xrange=None, fmt="png", **style):
+    """
+    render the graph of a function (see plot_function) as image
+    in the given format ("png" or "svg"), returned as bytes
+    """
+
+    buffer = io.BytesIO()
+    plot_function(func, xrange, **style).savefig(
+        buffer, format=fmt, metadata=IMAGE_METADATA[fmt])
+    return buffer.getvalue()
@@ -0,0 +1,122 @@
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from .math_cache import expression_key
+from .math_plot import PLOT_STYLE, plot_to_image
+from .math_rfunction import RFunction
+
+# Directory of rendered graphs, see set_plot_directory
+PLOT_CACHE = {
+    "dir": os.path.join(os.path.expanduser("~"), ".cache", "cyllene", "plots")
+}
+
+IMAGE_FORMATS = ["png", "svg"]
+
+
+def set_plot_directory(path):
+    """ store rendered graphs in path (created if necessary) """
+
+    os.makedirs(path, exist_ok=True)
+    PLOT_CACHE["dir"] = path
+
+
+def plot_data(func):
+    """
+    picklable description (data, variable, analysis) of a function
+    given as RFunction, sympy expression, or string
+    """
+
+    if not isinstance(func, RFunction):
+        func = RFunction(func)
+
+    if func.status == "finite":
+        data = [list(_) for _ in func.table]
+    else:
+        data = func.sym_form
+
+    return data, str(func.variable), func.analysis
+
+
+def plot_key(data, xrange, fmt, style):
+    """ content address of a graph: hash of expression, range, and style """
+
+    expr, variable, analysis = data
+    if xrange is not None:
+        xrange = (float(xrange[0]), float(xrange[1]))
+
+    return expression_key(expr, variable, analysis, xrange, fmt,
+                          sorted(style.items()))
+
+
+def _render(job):
+    # render a graph and write it to path (in a worker process)
+    (data, variable, analysis), xrange, fmt, style, path = job
+
+    image = plot_to_image(RFunction(data, variable, analysis=analysis),
+                          xrange, fmt, **style)
+
+    # write to a temporary file first, so that other processes never
+    # see a partially written image
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(image)
+    os.replace(tmp_path, path)
+
+
+def plot_files(functions: list, xrange=None, fmt="png", max_workers=None, **style):
+    """Render the graphs of several functions, reusing rendered images
+
+    Images are stored in PLOT_CACHE["dir"] under a hash of expression,
+    range, format, and style, so identical graphs (across problem
+    variants, exports, and sessions) are rendered only once. Missing
+    images are rendered in a process pool.
+
+    Parameters
+    ----------
+    functions : list
+        RFunctions, sympy expressions, or strings
+    xrange : tuple
+        range of the x-axis (default: determine_xrange of each function)
+    fmt : str
+        image format, "png" or "svg"
+    max_workers : int
+        number of worker processes (1: render in current process,
+        None: one per processor)
+    style : dict
+        overrides entries of PLOT_STYLE
+
+    Returns the list of image paths (one per function).
+    """
+
+    if fmt not in IMAGE_FORMATS:
+        raise ValueError(str(fmt) + " is not a valid image format")
+
+    style = {**PLOT_STYLE, **style}
+    os.makedirs(PLOT_CACHE["dir"], exist_ok=True)
+
+    paths = []
+    pending = {}
+    for func in functions:
+        data = plot_data(func)
+        path = os.path.join(PLOT_CACHE["dir"],
+                            plot_key(data, xrange, fmt, style) + "." + fmt)
+        paths.append(path)
+        if path not in pending and not os.path.exists(path):
+            pending[path] = (data, xrange, fmt, style, path)
+
+    jobs = list(pending.values())
+    if max_workers != 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            list(executor.map(_render, jobs))
+    else:
+        for job in jobs:
+            _render(job)
+
+    return paths
+
+
+def plot_file(func, xrange=None, fmt="png", **style):
+    """ render the graph of a single function (see plot_files) """
+
+    return plot_files([func], xrange, fmt, max_workers=1, **style)[0]
@@ -1,7 +1,212 @@
+from concurrent.futures import ProcessPoolExecutor
+
 import sympy as sp
 from sympy.calculus.util import continuous_domain
 
+from .math_cache import BoundedCache
 from .math_define import define_expression
+from .math_lambdify import compile_function
+from .math_numanalysis import NUMERIC_ANALYSIS, numeric_analysis
+from .math_sortedtable import SortedTable
+
+# Properties computed by symbolic analysis of a function
+ANALYSIS_PROPERTIES = ["domain", "zeros", "critical_points", "inflection_points"]
+
+# Modes of analysis:
+#   "symbolic": solve with sympy (exact, can be slow)
+#   "numeric": find points numerically in NUMERIC_RANGE (bounded time)
+#   "auto": solve with np.roots for rational functions, otherwise with
+#           sympy, numerically if sympy finds no solution set
+ANALYSIS_MODES = ["symbolic", "numeric", "auto"]
+
+# Results of symbolic analysis, keyed by (sym_form, variable, property),
+# and of numeric analysis, keyed by (sym_form, variable, property, "numeric"),
+# shared by all RFunctions with the same expression
+ANALYSIS_CACHE = BoundedCache(maxsize=2048, policy="lru")
+
+
+def symbolic_domain(sym_form, variable):
+    try:
+        return continuous_domain(sym_form, variable, sp.S.Reals)
+    except NotImplementedError:
+        # not implemented for some functions (floor, for example),
+        # which sympy treats as defined everywhere
+        return sp.S.Reals
+
+
+def symbolic_zeros(sym_form, variable):
+    return sp.solveset(sym_form, variable, domain=sp.S.Reals)
+
+
+def non_differentiable_points(diff, variable, domain):
+    # points of the domain where a derivative is not defined
+    try:
+        return sp.Complement(domain, continuous_domain(diff, variable, sp.S.Reals))
+    except NotImplementedError:
+        # not implemented for some derivatives (sign(x), for example),
+        # such points are left out
+        return sp.EmptySet
+
+
+def symbolic_critical_points(sym_form, variable, domain=None):
+    # follow usual def of critical point
+    # (domain: domain of the function, if not the largest possible one)
+    if domain is None:
+        domain = symbolic_analysis(sym_form, variable, "domain")
+    diff = sp.diff(sym_form, variable)
+    non_def = non_differentiable_points(diff, variable, domain)
+    diff_zeros = sp.solveset(diff, variable, domain=sp.S.Reals)
+
+    return sp.Union(non_def, diff_zeros)
+
+
+def symbolic_inflection_points(sym_form, variable, domain=None):
+    # find args for potential inflection points
+    # following the usual procedure
+    if domain is None:
+        domain = symbolic_analysis(sym_form, variable, "domain")
+    diff_two = sp.diff(sp.diff(sym_form, variable), variable)
+    non_def = non_differentiable_points(diff_two, variable, domain)
+    diff_zeros = sp.solveset(diff_two, variable, domain=sp.S.Reals)
+
+    return sp.Union(non_def, diff_zeros)
+
+
+SYMBOLIC_ANALYSIS = {
+    "domain": symbolic_domain,
+    "zeros": symbolic_zeros,
+    "critical_points": symbolic_critical_points,
+    "inflection_points": symbolic_inflection_points,
+}
+
+
+def symbolic_analysis(sym_form, variable, name):
+    """
+    compute an analysis property (see ANALYSIS_PROPERTIES) of an
+    expression, using ANALYSIS_CACHE
+    """
+
+    key = (sym_form, variable, name)
+    result = ANALYSIS_CACHE.get(key)
+    if result is None:
+        result = SYMBOLIC_ANALYSIS[name](sym_form, variable)
+        ANALYSIS_CACHE.put(key, result)
+
+    return result
+
+
+# Order of the derivative whose zeros an analysis property consists of
+DERIVATIVE_ORDER = {"zeros": 0, "critical_points": 1, "inflection_points": 2}
+
+
+def unsolved(sym_form, variable, name):
+    # result of an analysis that finds no solution set: the points
+    # sought, as an (unevaluated) ConditionSet
+    expr = sp.diff(sym_form, variable, DERIVATIVE_ORDER[name])
+    return sp.ConditionSet(variable, sp.Eq(expr, 0), sp.S.Reals)
+
+
+def analysis_key(sym_form, variable, name, mode):
+    # key of the result of analyze in ANALYSIS_CACHE
+    if name not in NUMERIC_ANALYSIS or mode == "symbolic":
+        return (sym_form, variable, name)
+    return (sym_form, variable, name, mode)
+
+
+def analyze(sym_form, variable, name, mode="auto"):
+    """
+    compute an analysis property (see ANALYSIS_PROPERTIES) of an
+    expression in the given mode (see ANALYSIS_MODES), using ANALYSIS_CACHE
+
+    The domain is always computed symbolically. In mode "auto", roots of
+    rational functions are computed numerically (exact roots require mode
+    "symbolic"); for other functions, numeric analysis is used if sympy
+    cannot solve the equation (or only returns a ConditionSet).
+    If numeric analysis is not possible either (the expression cannot be
+    evaluated numerically), the result is a ConditionSet.
+    """
+
+    key = analysis_key(sym_form, variable, name, mode)
+    if len(key) == 3:
+        return symbolic_analysis(sym_form, variable, name)
+
+    result = ANALYSIS_CACHE.get(key)
+    if result is not None:
+        return result
+
+    if mode == "auto":
+        symbolic = None
+        if not sym_form.is_rational_function(variable):
+            try:
+                symbolic = symbolic_analysis(sym_form, variable, name)
+            except NotImplementedError:
+                pass
+        if symbolic is not None and not symbolic.has(sp.ConditionSet):
+            result = symbolic
+        else:
+            result = analyze(sym_form, variable, name, "numeric")
+            if symbolic is not None and isinstance(result, sp.ConditionSet):
+                # the ConditionSet found by sympy is more specific
+                result = symbolic
+    else:
+        result = numeric_analysis(sym_form, variable, name)
+        if result is None:
+            # cannot be evaluated numerically
+            result = unsolved(sym_form, variable, name)
+
+    ANALYSIS_CACHE.put(key, result)
+
+    return result
+
+
+def _analyze(args):
+    # compute several properties of an expression (in a worker process)
+    sym_form, variable, mode, names = args
+    return {name: analyze(sym_form, variable, name, mode) for name in names}
+
+
+def precompute_analysis(functions: list, names=ANALYSIS_PROPERTIES, max_workers=1):
+    """Compute analysis properties for a batch of RFunctions at once
+
+    Every distinct expression is analyzed only once (per analysis
+    mode, see analyze). The results are
+    stored in ANALYSIS_CACHE, from where the functions pick them up.
+
+    Parameters
+    ----------
+    functions : list
+        list of RFunction objects
+    names : list
+        properties to compute (see ANALYSIS_PROPERTIES)
+    max_workers : int
+        number of worker processes (1: compute in current process,
+        None: one per processor)
+    """
+
+    pending = []
+    for func in functions:
+        if func.status != "symbolic":
+            continue
+        job = (func.sym_form, func.variable, func.analysis, tuple(
+            name for name in names
+            if analysis_key(func.sym_form, func.variable, name,
+                            func.analysis) not in ANALYSIS_CACHE))
+        if job[3] and job not in pending:
+            pending.append(job)
+
+    if max_workers != 1 and len(pending) > 1:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            for job, results in zip(pending, executor.map(_analyze, pending)):
+                for name, result in results.items():
+                    ANALYSIS_CACHE.put(
+                        analysis_key(job[0], job[1], name, job[2]), result)
+    else:
+        for job in pending:
+            _analyze(job)
+
+    for func in functions:
+        for name in names:
+            func.get_analysis(name)
 
 
 class RFunction:
@@ -18,14 +223,25 @@ class RFunction:
     lambda : function
         lambda form of function for easy evaluation
     domain : sympy Set
-        domain of the function (can be subset of largest possible domain given by sym_form)
+        domain of the function (can be subset of largest possible domain given by sym_form);
+        computed on first access, like zeros, critical_points, and inflection_points
     table : list
         table of function values [[x_1, y_1], ..., [x_n,y_n]]
+    sorted_table : SortedTable
+        for functions given by a table: the table as sorted numpy arrays,
+        used for evaluation (lambda_form) and analysis (domain, zeros, and
+        critical points are numpy arrays in this case)
     valid : bool
         flag whether function is properly defined or just dummy placeholder
+    backend : str
+        backend used by lambda_form: "sympy", "math", or "numpy"
+    analysis : str
+        how zeros, critical points, and inflection points are found:
+        "symbolic", "numeric", or "auto" (see ANALYSIS_MODES)
     """
 
-    def __init__(self, data, variable="x", mylocals=None):
+    def __init__(self, data, variable="x", mylocals=None, backend="sympy",
+                 analysis="auto"):
         """Initialize the RFunction object. 
 
         Parameters
@@ -36,6 +252,11 @@ class RFunction:
             name of variable used by Sympy
         mylocals : dict
             dictionary to be used by sympy parser
+        backend : str
+            backend used for evaluation: "sympy" (exact), "math"
+            (fast for single numbers), or "numpy" (accepts arrays)
+        analysis : str
+            mode of analysis: "symbolic", "numeric", or "auto"
 
         As data, one can pass one of
             - string: will be sent to sympy parser to try and turn it into sympy expression
@@ -48,10 +269,15 @@ class RFunction:
         self.sym_form = sp.sympify('0')
         self.table = {}
         self.variable = sp.Symbol(variable, real=True)
-        self.lambda_form = sp.lambdify(
-            self.variable, self.sym_form, modules="sympy")
-        self.domain = sp.EmptySet
+        self.backend = backend
+        if analysis not in ANALYSIS_MODES:
+            raise ValueError(str(analysis) + " is not a valid analysis mode")
+        self.analysis = analysis
+        self.lambda_form = compile_function(
+            self.sym_form, self.variable, self.backend)
         self.status = "undefined"
+        self._analysis = {"domain": sp.EmptySet}
+        self._restricted_domain = False
 
         if isinstance(data, list):
             # function is given as table
@@ -88,12 +314,19 @@ class RFunction:
             # input ok
             self.status = "symbolic"
 
+            # the parser creates symbols without assumptions,
+            # replace the one named like the variable by the (real) variable
+            new_expr = new_expr.xreplace(
+                {s: self.variable for s in new_expr.free_symbols
+                 if s.name == self.variable.name})
+
             # Initialize all basic function attributes
+            # (analysis properties are computed on first access)
             self.sym_form = new_expr
-            self.lambda_form = sp.lambdify(
-                self.variable, self.sym_form, modules="sympy")
-            self.domain = continuous_domain(
-                self.sym_form, self.variable, sp.S.Reals)
+            self.lambda_form = compile_function(
+                self.sym_form, self.variable, self.backend)
+            self._analysis = {}
+            self._restricted_domain = False
 
     def set_function_from_table(self, data: list, variable="x"):
         """Instantiate a function from a list of values
@@ -115,65 +348,85 @@ class RFunction:
             raise ValueError(str(variable) + " is not a valid variable")
 
         # Assemble a function (with finite domain) with the given values,
-        # using sympy Piecewise
+        # stored as sorted arrays (the symbolic form is built on demand)
+        self.sorted_table = SortedTable(data)
+        self.table = data
+        self._sym_form = None
+        self._analysis = {"domain": self.sorted_table.domain}
+        self.lambda_form = self.sorted_table
+        self.status = "finite"
 
-        try:
+    @property
+    def sym_form(self):
+        if self._sym_form is None and self.status == "finite":
+            # Assemble a sympy Piecewise function with the given values
             condition_list = []
-            for _ in data:
+            for _ in self.table:
                 condition_list.append((sp.nan, self.variable < _[0]))
                 condition_list.append((_[1], self.variable <= _[0]))
 
-            self.sym_form = sp.piecewise_exclusive(
+            self._sym_form = sp.piecewise_exclusive(
                 sp.Piecewise(*condition_list))
-            self.domain = sp.Union(*[{_[0]} for _ in data])
-            self.table = data
-            self.lambda_form = sp.lambdify(
-                self.variable, self.sym_form, modules="sympy")
-            self.status = "finite"
-        except ValueError:
-            raise ValueError("Invalid value list")
 
-    @property
-    def zeros(self):
-        if self.status == 'symbolic':
-            return sp.solveset(self.sym_form, self.variable, domain=sp.S.Reals)
-        elif self.status == 'finite':
-            zeros = sp.EmptySet
-            for a in self.domain:
-                if a == 0:
-                    zeros.union({a})
-            return zeros
-        else:
-            return None
+        return self._sym_form
 
-    @property
-    def critical_points(self):
+    @sym_form.setter
+    def sym_form(self, value):
+        self._sym_form = value
+
+    def get_analysis(self, name):
+        """Return an analysis property (see ANALYSIS_PROPERTIES),
+        computing it on first access
 
-        if self.status == 'symbolic':
-            # for symbolic functions, follow usual def of critical point
-            diff = sp.diff(self.sym_form, self.variable)
-            non_def = sp.Complement(self.domain, continuous_domain(
-                diff, self.variable, sp.S.Reals))
-            diff_zeros = sp.solveset(diff, self.variable, domain=sp.S.Reals)
+        For symbolic functions, results are shared (via ANALYSIS_CACHE)
+        with all functions with the same expression, unless the domain
+        was restricted: then critical and inflection points are computed
+        (symbolically) for the restricted domain.
+        """
+
+        if name not in self._analysis:
+            if self.status == 'symbolic' and self._restricted_domain \
+                    and name in ['critical_points', 'inflection_points']:
+                self._analysis[name] = SYMBOLIC_ANALYSIS[name](
+                    self.sym_form, self.variable, self.domain)
+            elif self.status == 'symbolic':
+                self._analysis[name] = analyze(
+                    self.sym_form, self.variable, name, self.analysis)
+            elif self.status == 'finite':
+                self._analysis[name] = self.finite_analysis(name)
+            else:
+                return None
+
+        return self._analysis[name]
 
-            return sp.Union(non_def, diff_zeros)
-        elif self.status == 'finite':
+    def finite_analysis(self, name):
+        # for finite functions, analysis works on the sorted arrays
+
+        if name == 'zeros':
+            return self.sorted_table.zeros
+        elif name == 'critical_points':
             # for finite functions, every point is a critical point
-            return self.domain
+            return self.sorted_table.critical_points
         else:
             return None
 
     @property
-    def inflection_points(self):
+    def domain(self):
+        return self.get_analysis('domain')
 
-        if self.status == 'symbolic':
-            # for symbolic function, find args for potential inflection points
-            # following the usual procedure
-            diff_two = sp.diff(
-                sp.diff(self.sym_form, self.variable), self.variable)
-            non_def = sp.Complement(self.domain, continuous_domain(
-                diff_two, self.variable, sp.S.Reals))
-            diff_zeros = sp.solveset(
-                diff_two, self.variable, domain=sp.S.Reals)
-
-            return sp.Union(non_def, diff_zeros)
+    @domain.setter
+    def domain(self, value):
+        self._analysis = {'domain': value}
+        self._restricted_domain = True
+
+    @property
+    def zeros(self):
+        return self.get_analysis('zeros')
+
+    @property
+    def critical_points(self):
+        return self.get_analysis('critical_points')
+
+    @property
+    def inflection_points(self):
+        return self.get_analysis('inflection_points')
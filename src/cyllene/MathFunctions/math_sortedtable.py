@@ -0,0 +1,78 @@
+from bisect import bisect_left
+
+import numpy as np
+
+
+class SortedTable:
+    """
+    Function with finite domain, given by a table of values and stored
+    as sorted numpy arrays.
+
+    Evaluating at a single number takes O(log n) steps (bisection),
+    evaluating at an array of numbers is vectorized. Outside the domain,
+    the value is nan.
+
+    Attributes:
+    -----------
+    x : numpy array
+        sorted arguments (the domain)
+    y : numpy array
+        corresponding values
+    """
+
+    def __init__(self, data: list):
+        """Build the table from a list of [x, y] pairs
+
+        If an argument appears more than once, its first value is used.
+        Raises ValueError if the pairs are not numeric.
+        """
+
+        try:
+            pairs = np.array([[float(_[0]), float(_[1])] for _ in data],
+                             dtype=float).reshape(-1, 2)
+        except (TypeError, ValueError, IndexError):
+            raise ValueError("Invalid value list")
+
+        # sort by argument (stably, so that first occurrences come first)
+        # and drop repeated arguments
+        pairs = pairs[np.argsort(pairs[:, 0], kind="stable")]
+        keep = np.ones(len(pairs), dtype=bool)
+        keep[1:] = pairs[1:, 0] != pairs[:-1, 0]
+
+        self.x = pairs[keep, 0]
+        self.y = pairs[keep, 1]
+
+        # python lists for fast scalar lookup
+        self._x_list = self.x.tolist()
+        self._y_list = self.y.tolist()
+
+    def __len__(self):
+        return len(self.x)
+
+    def __call__(self, value):
+
+        if np.ndim(value) == 0:
+            i = bisect_left(self._x_list, value)
+            if i < len(self._x_list) and self._x_list[i] == value:
+                return self._y_list[i]
+            return np.nan
+
+        value = np.asarray(value, dtype=float)
+        if len(self.x) == 0:
+            return np.full(value.shape, np.nan)
+
+        i = np.minimum(np.searchsorted(self.x, value), len(self.x) - 1)
+        return np.where(self.x[i] == value, self.y[i], np.nan)
+
+    @property
+    def domain(self):
+        return self.x
+
+    @property
+    def zeros(self):
+        return self.x[self.y == 0]
+
+    @property
+    def critical_points(self):
+        # every point of a finite domain is a critical point
+        return self.x
@@ -1,3 +1,6 @@
+from bisect import bisect_left
+from collections import namedtuple
+
 #  Operators
 #  List of standard mathematical operators
 
@@ -392,15 +395,212 @@ class MathString:
 
 def check_syntax(expr):
 
-    # Basic function wrapper for MathString check syntax
-    test_expr = MathString(expr)
+    # Same result as the MathString pipeline
+    #   fix_exponents, fix_minuses, check_format
+    # computed in a single pass, see scan_syntax below
+    s, compilable, issues = scan_syntax(expr)
+
+    return s, compilable, [issue.message for issue in issues]
+
+
+"""
+Single-pass syntax check
+---
+scan_syntax gives the same result as check_syntax (the MathString
+pipeline above), in time linear in the length of the input, and reports
+the position of each issue in the input string.
+"""
+
+SyntaxIssue = namedtuple("SyntaxIssue", ["message", "position"])
+
+
+def normalize_string(expr):
+    """
+    fix_exponents and fix_minuses in a single pass
+
+    Returns the normalized string and, for each of its characters,
+    its position in expr.
+    """
+
+    chars = []
+    positions = []
+    n = len(expr)
+    i = 0
+    while i < n:
+        if expr[i] == '*' and i+1 < n and expr[i+1] == '*':
+            chars.append('^')
+            positions.append(i)
+            i += 2
+            continue
+
+        if expr[i] != '-':
+            chars.append(expr[i])
+            positions.append(i)
+            i += 1
+            continue
+
+        # a run of minuses: its sign depends on its length,
+        # whether it is at the beginning or end, and the character before
+        j = i
+        while j < n and expr[j] == '-':
+            j += 1
+        odd = (j - i) % 2 == 1
+
+        if i == 0 or j == n or chars[-1] in ['+', '*', '/', '^']:
+            sign = '-' if odd else ''
+        else:
+            sign = '-' if odd else '+'
+
+        if sign:
+            chars.append(sign)
+            positions.append(i)
+        i = j
+
+    return ''.join(chars), positions
+
+
+def scan_syntax(expr):
+    """
+    normalize and check a string to be interpreted as math expression
+
+    Returns the normalized string, whether it is compilable, and the
+    list of issues (as SyntaxIssue, with the position of the issue in
+    expr), exactly as check_syntax, but in linear time.
+    """
 
-    # do some pre-processing
-    # test_expr.add_times()
-    test_expr.fix_exponents()
-    test_expr.fix_minuses()
+    if not isinstance(expr, str):
+        expr = MathString(expr).s
+
+    s, positions = normalize_string(expr)
+    n = len(s)
+
+    if n == 0:
+        return s, False, [SyntaxIssue('empty', 0)]
+
+    issues = []
+    function_issues = []
+
+    # depth[t]: number of open minus close parentheses in s[:t]
+    depth = [0] * (n+1)
+    # last position t with depth[t] == d (so far)
+    last_at = {0: 0}
+    # commas and logs waiting for the depth to drop to a given level
+    pending = {}
+    open_parentheses = []
+    first_negative = None
+    first_unmatched = None
+
+    # commas: position -> [last position before with depth one less,
+    #                      first position after with depth one less]
+    commas = {}
+    # logs: position of 'log' -> [start, end] of its context
+    logs = {}
+    # letter runs: position of last letter -> word
+    words = {}
+    word_start = None
+
+    for i in range(n):
+        c = s[i]
+
+        # check if the character at index i and the one after it can appear together in a proper mathematical expression
+        if i < n-1:
+            issues += [SyntaxIssue(_, i) for _ in check_adjacency(s[i:i+2])]
+
+        letter = is_letter(c)
+        if (c not in binary_operators) and (not letter) and (not is_number(c)) and (c not in ['.', '(', ')', ',']):
+            issues.append(SyntaxIssue('invalid character: '+c, i))
+
+        # words: functions must be followed by parentheses
+        if letter:
+            if word_start is None:
+                word_start = i
+            if i == n-1 or not is_letter(s[i+1]):
+                word = s[word_start:i+1]
+                words[i] = word
+                if word in unary_operators and (i == n-1 or s[i+1] != '('):
+                    function_issues.append(SyntaxIssue(
+                        'function '+word+' must be followed by parentheses', word_start))
+                word_start = None
+
+        if c == ',':
+            commas[i] = [last_at.get(depth[i]-1, -1), n+1]
+            pending.setdefault(depth[i]-1, []).append(commas[i])
+
+        # count parentheses
+        depth[i+1] = depth[i]
+        if c == '(':
+            depth[i+1] += 1
+            open_parentheses.append(i)
+        elif c == ')':
+            depth[i+1] -= 1
+            if open_parentheses:
+                open_parentheses.pop()
+            elif first_unmatched is None:
+                first_unmatched = i
+            if depth[i+1] < 0 and first_negative is None:
+                first_negative = i
+            for entry in pending.pop(depth[i+1], []):
+                entry[1] = i+1
+        last_at[depth[i+1]] = i+1
+
+        # context of a log: from the enclosing open parenthesis (or the
+        # start) to the parenthesis closing it (or the end)
+        if i >= 2 and s[i-2:i+1] == 'log':
+            if i < n-1:
+                # the start is known after the next step, see below
+                logs[i-2] = [None, n]
+                pending.setdefault(depth[i+1]-1, []).append(logs[i-2])
+            else:
+                logs[i-2] = [last_at.get(depth[n]-1, 0), n]
+
+        # start of the context of a log ending at i-1
+        if i >= 3 and s[i-3:i] == 'log':
+            logs[i-3][0] = last_at.get(depth[i+1]-1, 0)
+
+    # interpret the results of the parentheses counting
+    nest_level = depth[n]
+    if nest_level > 0:
+        issues.append(SyntaxIssue('more open parentheses than close parentheses',
+                                  open_parentheses[0] if open_parentheses else n-1))
+    if nest_level < 0:
+        issues.append(SyntaxIssue('more close parentheses than open parentheses',
+                                  first_unmatched))
+    if first_negative is not None:
+        issues.append(SyntaxIssue('parentheses unbalanced', first_negative))
+
+    # check the begining and end of the input string
+    if s[0] in ['+', '*', '/', '^']:
+        issues.append(SyntaxIssue('cannot begin with an operator', 0))
+    if s[-1] in binary_operators:
+        issues.append(SyntaxIssue('cannot end with an operator', n-1))
+
+    issues += function_issues
+
+    # commas must separate the arguments of functions accepting them
+    for i, (before, after) in commas.items():
+        if before <= 0:
+            issues.append(SyntaxIssue('commas must separate function arguments', i))
+            continue
+
+        f = words.get(before-1, '')
+        if f not in unary_operators:
+            issues.append(SyntaxIssue('commas must separate function arguments', i))
+        elif f not in unary_operators_with_parameters:
+            issues.append(SyntaxIssue(f+' does not accept multiple arguments.', i))
+
+    # count the arguments of log (commas at the top level of its context)
+    comma_positions = list(commas)
+    for i, (start, after) in logs.items():
+        end = min(after, n)
+        first = bisect_left(comma_positions, start)
+        last = bisect_left(comma_positions, end)
+        comma_count = sum(
+            1 for k in comma_positions[first:last]
+            if commas[k][0] <= start and commas[k][1] >= end)
+        if comma_count > 1:
+            issues.append(SyntaxIssue('log accepts a maximum of two arguments', i))
 
-    # Check syntax
-    test_expr.check_format()
+    issues = [SyntaxIssue(message, positions[position] if position < n else len(expr))
+              for message, position in issues]
 
-    return test_expr.s, test_expr.compilable, test_expr.issues
+    return s, len(issues) == 0, issues
@@ -1,9 +1,160 @@
+import numpy as np
 import pandas as pd
+import sympy as sp
 
+from .math_compare import ATOL, evaluate_lambda, real_values
+from .math_functionclass import Function
+from .math_lambdify import compile_function
+from .math_rfunction import RFunction
 
-def function_to_table(func, values, name=['x', 'f(x)']):
+# Variable of constant functions given as sympy expressions
+TABLE_VARIABLE = sp.Symbol("x", real=True)
 
-    return pd.DataFrame({name[0]: values, name[1]: [func(v) for v in values]})
+# Entry of formatted tables where a function is undefined
+UNDEFINED = "undefined"
+
+
+def table_form(func):
+    """
+    expression of a function and its variable
+
+    func can be a Function, RFunction, sympy expression, string, or a
+    function returned by compile_function (e.g. by function()).
+    Returns None if func has no expression in a single variable
+    (e.g. functions given by a table, or other Python functions).
+    """
+
+    if isinstance(func, str):
+        func = Function(func)
+
+    if isinstance(func, (Function, RFunction)):
+        if getattr(func, "status", None) == "finite":
+            return None
+        expr, variables = func.sym_form, [func.variable]
+    elif isinstance(func, sp.Basic):
+        expr, variables = func, list(func.free_symbols)
+    elif hasattr(func, "expr") and isinstance(func.expr, sp.Basic):
+        expr, variables = func.expr, func.variables
+        if not isinstance(variables, (list, tuple)):
+            variables = [variables]
+    else:
+        return None
+
+    if len(variables) > 1:
+        return None
+
+    # the expression may use a symbol with other assumptions than
+    # the function variable, so check by name
+    symbols = list(expr.free_symbols)
+    if len(symbols) > 1 or (symbols and variables and
+                            str(symbols[0]) != str(variables[0])):
+        return None
+
+    variable = symbols[0] if symbols else (variables or [TABLE_VARIABLE])[0]
+    return expr, variable
+
+
+def evaluate_callable(func, values):
+    """
+    evaluate a Python function at a numpy array of values: in one call
+    if it accepts arrays, point by point otherwise
+    """
+
+    if isinstance(func, (Function, RFunction)):
+        func = func.lambda_form
+
+    try:
+        with np.errstate(all="ignore"):
+            return real_values(func(values), values.shape)
+    except Exception:
+        pass
+
+    result = np.full(values.shape, np.nan)
+    for index, value in enumerate(values):
+        try:
+            value = complex(func(value))
+        except Exception:
+            continue
+        if abs(value.imag) <= ATOL:
+            result[index] = value.real
+
+    return real_values(result, values.shape)
+
+
+def evaluate_table(functions: list, values):
+    """
+    evaluate several functions at the same values
+
+    Functions with an expression (see table_form) are compiled for numpy
+    (using the cache of compile_function, so repeated tables of the same
+    variants are not compiled again) and each is evaluated at all values
+    in one vectorized call.
+    Returns a float array with one row per function (nan where a
+    function is undefined or not real).
+    """
+
+    values = np.asarray(values, dtype=float)
+    result = np.full((len(functions), len(values)), np.nan)
+
+    for index, func in enumerate(functions):
+        form = table_form(func)
+        if form is None:
+            result[index] = evaluate_callable(func, values)
+            continue
+
+        row = evaluate_lambda(compile_function(*form, "numpy"), [values])
+        if row is None:
+            # expression cannot be evaluated with numpy
+            row = evaluate_callable(compile_function(*form, "sympy"), values)
+        result[index] = row
+
+    return result
+
+
+def format_values(values, digits=3):
+    """
+    round an array of numbers to the given number of digits and turn
+    them into strings (without trailing zeros), all at once
+
+    Undefined values (nan) become UNDEFINED.
+    """
+
+    values = np.asarray(values, dtype=float)
+
+    # adding 0.0 turns -0.0 into 0.0
+    with np.errstate(invalid="ignore"):
+        strings = np.char.mod("%." + str(digits) + "f", np.round(values, digits) + 0.0)
+    if digits > 0:
+        strings = np.char.rstrip(np.char.rstrip(strings, "0"), ".")
+
+    return np.where(np.isnan(values), UNDEFINED, strings)
+
+
+def functions_to_table(functions: list, values, names=None, digits=None):
+    """
+    table of values of several functions (e.g. the variants of a
+    problem), as DataFrame with one column per function
+
+    names gives the column names (first the one for the x-values).
+    The x-values are shown as passed. The function values are floats
+    (computed with numpy, see evaluate_table), also for functions whose
+    lambda form gives exact values (like rationals); with digits, they
+    are formatted as rounded strings.
+    """
+
+    if names is None:
+        names = ["x"] + ["f_" + str(index + 1) for index in range(len(functions))]
+
+    columns = evaluate_table(functions, values)
+    if digits is not None:
+        columns = format_values(columns, digits)
+
+    return pd.DataFrame(dict(zip(names, [list(values)] + list(columns))))
+
+
+def function_to_table(func, values, name=['x', 'f(x)'], digits=None):
+
+    return functions_to_table([func], values, name, digits)
 
 
 def output_table(table):
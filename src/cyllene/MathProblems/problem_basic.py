@@ -2,7 +2,8 @@ import random
 from re import M
 from sympy import Basic
 from ..aux.helpers import extract_dict, set_attr_dict, get_attr_dict
-from ..MathFunctions.math_compare import compare_functions
+from ..MathFunctions.math_checker import AnswerChecker
+from ..MathFunctions.math_compare_timed import compare_functions_timed
 from ..MathFunctions.math_define import define_expression
 
 
@@ -119,21 +120,42 @@ class MultipleChoice(Problem):
 
 class ExpressionProblem(Problem):
 
+    @property
+    def answer_checker(self):
+        # compile the answer once (and again whenever it changes)
+        checker = getattr(self, "_answer_checker", None)
+        if checker is None or checker.answer != self.answer:
+            checker = AnswerChecker(self.answer)
+            self._answer_checker = checker
+        return checker
+
     @property
     def answer_expression(self):
         # try to convert answer to sympy expression
-        return define_expression(self.answer)[0]
+        return self.answer_checker.expression
+
+    def check_answer(self, user_answer: str, mode="full", timed=False):
+        """
+        check a user answer against the problem answer
 
-    def check_answer(self, user_answer: str, mode="full"):
+        If timed is True, the comparison runs with a time budget
+        (see math_compare_timed) and gives up instead of hanging.
+        """
 
         user_answer_expression = define_expression(user_answer)[0]
 
         if user_answer_expression:
             # user_answer is sympy expression, proceed with check routine
-            check = compare_functions(
-                user_answer_expression, self.answer_expression, mode)
+            if timed:
+                check = compare_functions_timed(
+                    user_answer_expression, self.answer_expression, mode).result
+            else:
+                check = self.answer_checker.check(user_answer_expression, mode)
             if isinstance(check, bool):
                 return check
+            elif check == "timeout":
+                print("Unable to decide answer in time")
+                return None
             else:
                 print("Unable to decide answer")
                 return None
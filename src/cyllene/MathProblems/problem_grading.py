@@ -0,0 +1,201 @@
+import argparse
+import csv
+import json
+import os
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from ..MathFunctions.math_cache import BoundedCache
+from ..MathFunctions.math_checker import AnswerChecker
+from ..MathFunctions.math_define import define_expression
+from ..MathFunctions.math_helpers import get_variables
+
+GradingResult = namedtuple(
+    "GradingResult", ["verdicts", "num_distinct", "elapsed", "throughput"])
+
+# Compiled answers of the current (worker) process
+CHECKERS = BoundedCache(maxsize=256)
+
+
+def grade_many(problem, submissions: list, mode="full"):
+    """
+    Grade a list of submissions (strings) against the answer of an
+    ExpressionProblem
+
+    Every distinct submission string is parsed and checked only once.
+    Distinct submissions are first evaluated together on the shared
+    rejection points of the problem's answer checker, so that clearly
+    wrong answers are rejected in one vectorized step; the remaining
+    ones go through the full comparison.
+
+    Returns a GradingResult (verdicts, num_distinct, elapsed, throughput):
+    verdicts holds one entry per submission, which is True, False,
+    "undecided", or "invalid" (if the submission cannot be parsed);
+    throughput is the number of submissions graded per second.
+    """
+
+    start = time.perf_counter()
+    checker = problem.answer_checker
+
+    # parse every distinct submission once
+    distinct = list(dict.fromkeys(submissions))
+    expressions = {s: define_expression(s)[0] for s in distinct}
+
+    verdict_dict = {}
+    candidates = []
+    for s in distinct:
+        expr = expressions[s]
+        if expr is None:
+            verdict_dict[s] = "invalid"
+        elif len(get_variables(expr)) != len(checker.variables):
+            verdict_dict[s] = False
+        elif expr == checker.expression:
+            verdict_dict[s] = True
+        else:
+            candidates.append(s)
+
+    # reject clearly wrong answers on the shared sample points
+    if mode != "strict":
+        rejected = checker.reject_many([expressions[s] for s in candidates])
+        for s, reject in zip(candidates, rejected):
+            if reject:
+                verdict_dict[s] = False
+        candidates = [s for s in candidates if s not in verdict_dict]
+
+    for s in candidates:
+        verdict_dict[s] = checker.check(expressions[s], mode, numeric_first=False)
+
+    elapsed = time.perf_counter() - start
+    verdicts = [verdict_dict[s] for s in submissions]
+    throughput = len(submissions) / elapsed if elapsed > 0 else float("inf")
+
+    return GradingResult(verdicts, len(distinct), elapsed, throughput)
+
+
+def read_submissions(path: str):
+    """
+    Read submissions from a JSONL file (one JSON object per line) or a
+    CSV file with header row (any other file extension)
+
+    Every record should have a "submission" field and, unless an answer
+    is passed to grade_file, an "answer" field. Further fields (such as
+    a student id) are passed through to the results.
+    Yields the records as dictionaries.
+    """
+
+    with open(path, newline="") as f:
+        if path.endswith(".jsonl"):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(f)
+
+
+def get_checker(answer):
+    """ return the compiled answer, using CHECKERS """
+
+    checker = CHECKERS.get(answer)
+    if checker is None:
+        checker = AnswerChecker(answer)
+        CHECKERS.put(answer, checker)
+    return checker
+
+
+def grade_record(record: dict, answer=None, mode="full"):
+    """
+    Grade a single record (as read by read_submissions)
+
+    Returns a copy of the record with an additional "verdict" field:
+    True, False, "undecided", or "invalid".
+    """
+
+    if answer is None:
+        answer = record.get("answer", "")
+    mode = record.get("mode") or mode
+
+    checker = get_checker(str(answer))
+    expr = define_expression(str(record.get("submission", "")))[0]
+
+    if expr is None or checker.expression is None:
+        verdict = "invalid"
+    else:
+        verdict = checker.check(expr, mode)
+
+    return dict(record, verdict=verdict)
+
+
+def _grade_chunk(records, answer, mode):
+    # grade a list of records (in a worker process)
+    return [grade_record(record, answer, mode) for record in records]
+
+
+def grade_file(path: str, answer=None, mode="full",
+               max_workers=None, chunksize=32, max_pending=None):
+    """
+    Grade all submissions in a JSONL or CSV file on a pool of processes
+
+    Each worker process keeps the compiled answers (see CHECKERS) and its
+    verdict cache across records, so repeated answers and submissions are
+    cheap. Results are yielded as they come in, in input order
+    (see grade_record).
+
+    The file is read lazily: at most max_pending chunks of records are
+    submitted ahead of the results yielded, so memory use does not grow
+    with the size of the file.
+
+    Keyword arguments:
+    answer -- answer used for all records (default: "answer" field of each record)
+    mode -- comparison mode, unless given by a record's "mode" field
+    max_workers -- number of processes (default: number of processors)
+    chunksize -- number of records sent to a worker at once
+    max_pending -- number of chunks submitted ahead (default: twice the
+        number of processes)
+    """
+
+    if max_pending is None:
+        max_pending = 2 * (max_workers or os.cpu_count() or 1)
+
+    records = read_submissions(path)
+    chunks = iter(lambda: list(islice(records, chunksize)), [])
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        pending = deque()
+        for chunk in chunks:
+            if len(pending) >= max_pending:
+                yield from pending.popleft().result()
+            pending.append(executor.submit(_grade_chunk, chunk, answer, mode))
+        while pending:
+            yield from pending.popleft().result()
+
+
+def main():
+    """
+    Command line interface:
+        python -m cyllene.MathProblems.problem_grading submissions.jsonl
+    writes one JSON object per graded record to stdout (or --output)
+    """
+
+    parser = argparse.ArgumentParser(
+        description="Grade submissions from a JSONL or CSV file.")
+    parser.add_argument("path", help="JSONL or CSV file of submissions")
+    parser.add_argument("--answer", help="answer used for all submissions")
+    parser.add_argument("--mode", default="full", help="comparison mode")
+    parser.add_argument("--workers", type=int, help="number of processes")
+    parser.add_argument("--output", help="output file (JSONL)")
+    args = parser.parse_args()
+
+    out = open(args.output, "w") if args.output else None
+    try:
+        for result in grade_file(args.path, args.answer, args.mode,
+                                 max_workers=args.workers):
+            print(json.dumps(result), file=out)
+    finally:
+        if out is not None:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,9 @@
-# import os
+import os
 # import subprocess
 import re
+import shutil
 
+from ..MathFunctions.math_plotcache import plot_files
 from ..MathProblems.problem_basic import MultipleChoice
 
 
@@ -62,6 +64,36 @@ class Problems2Text:
             version_pattern = re.compile(r"VERSIONGOESHERE")
             self.txt_quiz = version_pattern.sub(str(index+1), self.txt_quiz)
 
+    def export_plots(self, functions, directory=".", name="graph", fmt="png",
+                     xrange=None, max_workers=None, **style):
+        """Write the graphs for the problems as image files
+
+        The graph for the problem with version number n (the number
+        VERSIONGOESHERE is replaced with) is written as <name>n.<fmt>,
+        so a statement can refer to it as ![](graphVERSIONGOESHERE.png).
+        Images come from the plot cache (see math_plotcache.plot_files):
+        identical graphs are rendered once, missing ones in parallel.
+
+        :param functions: list of functions (one per problem), or a function
+            returning the function to plot for a given problem
+        :param directory: directory to write the images to
+        :returns: list of image paths
+        """
+
+        if callable(functions):
+            functions = [functions(problem) for problem in self.problems]
+
+        cached_paths = plot_files(functions, xrange, fmt, max_workers, **style)
+
+        os.makedirs(directory, exist_ok=True)
+        paths = []
+        for index, cached_path in enumerate(cached_paths):
+            path = os.path.join(directory, name + str(index+1) + "." + fmt)
+            shutil.copyfile(cached_path, path)
+            paths.append(path)
+
+        return paths
+
     def convert_multiple_choice_problem(self, problem):
 
         if self.with_solution:
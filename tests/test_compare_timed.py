@@ -0,0 +1,42 @@
+import time
+
+import pytest
+import sympy as sp
+
+from cyllene.MathFunctions import math_compare
+from cyllene.MathFunctions.math_compare_timed import (
+    ComparisonEngine, WorkerError)
+
+
+def sleeping_stage(func_1, func_2):
+    time.sleep(3)
+    return True
+
+
+def test_slow_stage_times_out():
+    engine = ComparisonEngine(stage_timeout=1)
+    try:
+        with pytest.raises(TimeoutError) as info:
+            engine.run_stage("sleep", time.sleep, 3)
+        assert not isinstance(info.value, WorkerError)
+        assert info.value.args == ("sleep",)
+
+        # the worker is restarted for the next stage
+        assert engine.run_stage("abs", abs, -2) == 2
+    finally:
+        engine.stop()
+
+
+def test_slow_comparison_gives_timeout_verdict(monkeypatch):
+    # replace the term-by-term stage by one that runs out of time
+    monkeypatch.setattr(math_compare, "compare_terms", sleeping_stage)
+    engine = ComparisonEngine(stage_timeout=1)
+    x = sp.Symbol("x", real=True)
+
+    try:
+        verdict = engine.compare(sp.sin(x) ** 2, 1 - sp.cos(x) ** 2,
+                                 numeric_first=False)
+        assert verdict.result == "timeout"
+        assert verdict.stage == "terms"
+    finally:
+        engine.stop()